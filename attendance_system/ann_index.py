@@ -0,0 +1,200 @@
+import numpy as np
+import logging
+from gallery_matcher import normalize_embeddings
+
+logger = logging.getLogger(__name__)
+
+
+def _top_k(ids, similarities, k):
+    # Highest-similarity k entries, padded with id -1 when fewer candidates exist
+    result_ids = np.full(k, -1, dtype=np.int64)
+    result_similarities = np.full(k, -np.inf, dtype=np.float32)
+    if len(ids) == 0:
+        return result_ids, result_similarities
+    n = min(k, len(ids))
+    best = np.argpartition(-similarities, n - 1)[:n]
+    best = best[np.argsort(-similarities[best])]
+    result_ids[:n] = ids[best]
+    result_similarities[:n] = similarities[best]
+    return result_ids, result_similarities
+
+
+class ExactIndex:
+    # Brute-force reference index with the same interface as IVFIndex
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, ids, vectors):
+        self.ids = np.concatenate((self.ids, np.asarray(ids, dtype=np.int64)))
+        self.vectors = np.ascontiguousarray(np.concatenate((self.vectors, normalize_embeddings(vectors))))
+
+    def remove(self, ids):
+        keep = ~np.isin(self.ids, np.asarray(ids, dtype=np.int64))
+        self.ids = self.ids[keep]
+        self.vectors = np.ascontiguousarray(self.vectors[keep])
+
+    def search(self, queries, k=1):
+        queries = normalize_embeddings(queries)
+        similarities = queries @ self.vectors.T
+        results = [_top_k(self.ids, row, k) for row in similarities]
+        return np.array([r[0] for r in results]), np.array([r[1] for r in results])
+
+    def save(self, path):
+        np.savez(path, ids=self.ids, vectors=self.vectors)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            index = cls(data['vectors'].shape[1])
+            index.add(data['ids'], data['vectors'])
+        return index
+
+
+class IVFIndex:
+    # Inverted-file index: a spherical k-means coarse quantizer splits the vectors into nlist
+    # lists and a query only scores the nprobe lists whose centroids are closest. nprobe is the
+    # recall/latency knob: nprobe == nlist is exact search, smaller values scan less of the gallery.
+    #
+    # Until enough vectors have been added to train the quantizer everything lives in a single
+    # list, so small galleries behave exactly like brute force.
+
+    def __init__(self, dim, nlist=256, nprobe=8, train_iterations=10, seed=0):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iterations = train_iterations
+        self.seed = seed
+        self.centroids = None
+        self.list_ids = [np.empty(0, dtype=np.int64)]
+        self.list_vectors = [np.empty((0, dim), dtype=np.float32)]
+        self._list_of = {}
+
+    def __len__(self):
+        return len(self._list_of)
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def train(self, vectors=None):
+        # Fit the coarse quantizer, by default on the vectors already in the index, and redistribute them
+        ids, stored = self._all()
+        vectors = stored if vectors is None else normalize_embeddings(vectors)
+        nlist = min(self.nlist, len(vectors))
+        if nlist == 0:
+            return
+
+        rng = np.random.default_rng(self.seed)
+        sample = vectors[rng.choice(len(vectors), size=min(len(vectors), nlist * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+        for _ in range(self.train_iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            one_hot = np.zeros((len(sample), nlist), dtype=np.float32)
+            one_hot[np.arange(len(sample)), assignment] = 1.0
+            sums = one_hot.T @ sample
+            empty = ~np.bincount(assignment, minlength=nlist).astype(bool)
+            # Reseed empty lists with random sample points
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = normalize_embeddings(sums)
+
+        self.centroids = centroids
+        self.list_ids = [np.empty(0, dtype=np.int64) for _ in range(nlist)]
+        self.list_vectors = [np.empty((0, self.dim), dtype=np.float32) for _ in range(nlist)]
+        self._list_of = {}
+        if len(ids):
+            self._insert(ids, stored)
+        logger.info(f"Trained IVF index with {nlist} lists on {len(sample)} vectors")
+
+    def _all(self):
+        return np.concatenate(self.list_ids), np.concatenate(self.list_vectors)
+
+    def _assign(self, vectors):
+        if self.centroids is None:
+            return np.zeros(len(vectors), dtype=np.int64)
+        return np.argmax(vectors @ self.centroids.T, axis=1)
+
+    def _insert(self, ids, vectors):
+        assignment = self._assign(vectors)
+        order = np.argsort(assignment, kind='stable')
+        lists, starts = np.unique(assignment[order], return_index=True)
+        for list_no, block in zip(lists, np.split(order, starts[1:])):
+            self.list_ids[list_no] = np.concatenate((self.list_ids[list_no], ids[block]))
+            self.list_vectors[list_no] = np.ascontiguousarray(np.concatenate((self.list_vectors[list_no], vectors[block])))
+        self._list_of.update(zip(ids.tolist(), assignment.tolist()))
+
+    def add(self, ids, vectors):
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = normalize_embeddings(vectors)
+        if len(ids) != len(vectors):
+            raise ValueError(f"Got {len(ids)} ids for {len(vectors)} vectors")
+        self.remove(ids)
+        self._insert(ids, vectors)
+        if not self.is_trained and len(self) >= self.nlist * 16:
+            self.train()
+
+    def remove(self, ids):
+        by_list = {}
+        for id_ in np.asarray(ids, dtype=np.int64).tolist():
+            list_no = self._list_of.pop(id_, None)
+            if list_no is not None:
+                by_list.setdefault(list_no, []).append(id_)
+        for list_no, list_removed in by_list.items():
+            keep = ~np.isin(self.list_ids[list_no], list_removed)
+            self.list_ids[list_no] = self.list_ids[list_no][keep]
+            self.list_vectors[list_no] = np.ascontiguousarray(self.list_vectors[list_no][keep])
+
+    def search(self, queries, k=1, nprobe=None):
+        queries = normalize_embeddings(queries)
+        nprobe = min(nprobe or self.nprobe, len(self.list_ids))
+        if self.centroids is None:
+            probes = np.zeros((len(queries), 1), dtype=np.int64)
+        else:
+            probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+
+        result_ids = np.empty((len(queries), k), dtype=np.int64)
+        result_similarities = np.empty((len(queries), k), dtype=np.float32)
+        for i, (query, query_probes) in enumerate(zip(queries, probes)):
+            ids = np.concatenate([self.list_ids[list_no] for list_no in query_probes])
+            similarities = np.concatenate([self.list_vectors[list_no] @ query for list_no in query_probes])
+            result_ids[i], result_similarities[i] = _top_k(ids, similarities, k)
+        return result_ids, result_similarities
+
+    def save(self, path):
+        ids, vectors = self._all()
+        np.savez(
+            path,
+            ids=ids,
+            vectors=vectors,
+            centroids=self.centroids if self.centroids is not None else np.empty((0, self.dim), dtype=np.float32),
+            params=np.array([self.dim, self.nlist, self.nprobe, self.train_iterations, self.seed], dtype=np.int64)
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            dim, nlist, nprobe, train_iterations, seed = data['params'].tolist()
+            index = cls(dim, nlist=nlist, nprobe=nprobe, train_iterations=train_iterations, seed=seed)
+            if len(data['centroids']):
+                index.centroids = data['centroids']
+                index.list_ids = [np.empty(0, dtype=np.int64) for _ in range(len(index.centroids))]
+                index.list_vectors = [np.empty((0, dim), dtype=np.float32) for _ in range(len(index.centroids))]
+            if len(data['ids']):
+                index._insert(data['ids'], data['vectors'])
+        return index
+
+
+def create_index(kind, dim, nlist=256, nprobe=8):
+    # 'flat' keeps the GalleryMatcher's own brute-force matrix product and needs no index
+    if kind == 'flat':
+        return None
+    if kind == 'exact':
+        return ExactIndex(dim)
+    if kind == 'ivf':
+        return IVFIndex(dim, nlist=nlist, nprobe=nprobe)
+    raise ValueError(f"Unknown gallery index type: {kind}")
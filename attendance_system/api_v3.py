@@ -1,4 +1,5 @@
 from flask import Flask, request, jsonify
+from flask_socketio import SocketIO, emit
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_cors import CORS
@@ -15,24 +16,23 @@ import enum
 from sqlalchemy.exc import IntegrityError
 from werkzeug.utils import secure_filename
 import logging
-import cv2
-import numpy as np
 import traceback
-import base64
-from io import BytesIO
-from PIL import Image
 import random
-from faker import Faker
 import json
 import re
+import threading
+import math
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-fake = Faker()
-# Import your face recognition module
-from claude_face_recognition import FaceRecognition
+# Face recognition (tensorflow, MTCNN, cv2), Faker and the image libraries are imported on first
+# use through the accessors below, so report-only workers and management commands start quickly
+from gallery_cache import GalleryCache
+from timetable_scope import TimetableScope
+from debug_capture import get_debug_capture
+from config import Config
 
 app = Flask(__name__)
 # CORS(app, resources={r"/api/*": {"origins": "*", "allow_headers": ["Content-Type", "Authorization"]}})
@@ -49,13 +49,65 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max-limit
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
 jwt = JWTManager(app)
+socketio = SocketIO(app, cors_allowed_origins="*")
 
 # Ensure upload folder exists
 if not os.path.exists(app.config['UPLOAD_FOLDER']):
     os.makedirs(app.config['UPLOAD_FOLDER'])
 
-# Initialize FaceRecognition
-face_recognition = FaceRecognition.get_instance()
+_face_recognition = None
+_face_recognition_lock = threading.Lock()
+_fake = None
+
+def get_face_recognition():
+    global _face_recognition
+    if _face_recognition is None:
+        with _face_recognition_lock:
+            if _face_recognition is None:
+                # A shared inference server client when USE_INFERENCE_SERVER is set
+                from inference_client import load_face_recognition
+                _face_recognition = load_face_recognition()
+    return _face_recognition
+
+_frame_cache = None
+_frame_cache_lock = threading.Lock()
+
+def get_frame_cache():
+    # None when FRAME_CACHE_SIZE is 0
+    global _frame_cache
+    if _frame_cache is None and Config.FRAME_CACHE_SIZE > 0:
+        with _frame_cache_lock:
+            if _frame_cache is None:
+                from frame_cache import FrameCache
+                _frame_cache = FrameCache(
+                    max_entries=Config.FRAME_CACHE_SIZE,
+                    ttl=Config.FRAME_CACHE_TTL,
+                    hash_size=Config.FRAME_CACHE_HASH_SIZE,
+                    max_distance=Config.FRAME_CACHE_MAX_DISTANCE
+                )
+    return _frame_cache
+
+def get_faker():
+    global _fake
+    if _fake is None:
+        from faker import Faker
+        _fake = Faker()
+    return _fake
+
+def warm_up_face_recognition():
+    face_recognition = get_face_recognition()
+    if Config.USE_INFERENCE_SERVER:
+        # inference_server.py loads and warms the shared copy itself
+        return
+    if Config.WARMUP_ON_STARTUP:
+        face_recognition.warmup()
+    elif face_recognition.backend is not None:
+        face_recognition.ready.set()
+
+# Load and warm MTCNN and FaceNet in the background; /api/ready reports 503 until that has finished.
+# Report-only deployments set LOAD_FACE_RECOGNITION=false and never import tensorflow.
+if Config.LOAD_FACE_RECOGNITION:
+    threading.Thread(target=warm_up_face_recognition, name="face-recognition-warmup", daemon=True).start()
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
@@ -92,7 +144,10 @@ class Student(db.Model):
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
     college_id = db.Column(db.Integer, db.ForeignKey('college.id'), nullable=False)
     semester_id = db.Column(db.Integer, db.ForeignKey('semester.id'), nullable=False)
+    # Legacy pickled list of lists; rows converted by migrate_face_embeddings.py and new
+    # registrations use face_embeddings (embedding_codec format) instead
     face_encoding = db.Column(db.PickleType)
+    face_embeddings = db.Column(db.LargeBinary(length=2**24))
 
 class Lecturer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -160,6 +215,12 @@ class Attendance(db.Model):
     student = db.relationship('User', backref='attendances')
     timetable = db.relationship('Timetable', backref='attendances')
 
+# Change log polled by every worker's gallery cache; one row per student whose templates changed
+class GalleryChange(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
 # Helper functions
 def admin_required(fn):
     @wraps(fn)
@@ -171,6 +232,130 @@ def admin_required(fn):
         return fn(*args, **kwargs)
     return wrapper
 
+def parse_max_side(value):
+    # Client-supplied downscaling limit: None keeps Config.DETECTION_MAX_SIDE, 0 disables it.
+    # Raises ValueError for anything that is not a non-negative integer.
+    if value is None:
+        return None
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(value)
+    try:
+        max_side = int(value)
+    except TypeError:
+        raise ValueError(value)
+    if max_side < 0:
+        raise ValueError(value)
+    return max_side
+
+def response_distance(distance):
+    # An empty gallery matches at distance inf, which jsonify would write as Infinity (not JSON)
+    return distance if distance is not None and math.isfinite(distance) else None
+
+def record_gallery_change(student_id):
+    # Added to the caller's transaction so the change is only visible once the student row is committed with it
+    db.session.add(GalleryChange(student_id=student_id))
+
+def student_templates(student_id, face_embeddings, face_encoding):
+    # None for templates from another embedding model: they stay out of the gallery (and are
+    # logged) until the student re-enrolls or the rows are migrated
+    from embedding_codec import decode_embeddings, read_header
+
+    if face_embeddings is not None:
+        model_version = read_header(face_embeddings).model_version
+        if model_version != Config.EMBEDDING_MODEL_VERSION:
+            logger.warning(f"Student {student_id} has templates from model version {model_version}, current is "
+                           f"{Config.EMBEDDING_MODEL_VERSION}; skipped until re-enrolled")
+            return None
+        return decode_embeddings(face_embeddings)
+    return face_encoding
+
+def load_gallery_templates():
+    # Binary rows decode as np.frombuffer views; only rows not yet migrated are unpickled
+    # Skip the first student
+    binary = db.session.query(Student.id, Student.face_embeddings).filter(
+        Student.id != 1,
+        Student.face_embeddings.isnot(None)
+    )
+    for student_id, face_embeddings in binary:
+        templates = student_templates(student_id, face_embeddings, None)
+        if templates is not None:
+            yield student_id, templates
+    pickled = db.session.query(Student.id, Student.face_encoding).filter(
+        Student.id != 1,
+        Student.face_embeddings.is_(None),
+        Student.face_encoding.isnot(None)
+    )
+    for student_id, face_encoding in pickled:
+        yield student_id, face_encoding
+
+def load_student_templates(student_ids):
+    students = db.session.query(Student.id, Student.face_embeddings, Student.face_encoding).filter(
+        Student.id.in_(student_ids),
+        Student.id != 1
+    )
+    return {
+        student_id: student_templates(student_id, face_embeddings, face_encoding)
+        for student_id, face_embeddings, face_encoding in students
+    }
+
+def latest_gallery_change_id():
+    return db.session.query(func.max(GalleryChange.id)).scalar()
+
+def gallery_changes_since(change_id, gaps=()):
+    # gaps are skipped ids whose transactions may commit late; both halves use the primary key
+    newer = GalleryChange.id > change_id
+    return db.session.query(GalleryChange.id, GalleryChange.student_id).filter(
+        or_(newer, GalleryChange.id.in_(gaps)) if gaps else newer
+    ).order_by(GalleryChange.id).all()
+
+def create_gallery_index(dim):
+    from ann_index import create_index
+
+    return create_index(
+        Config.GALLERY_INDEX,
+        dim,
+        nlist=Config.GALLERY_INDEX_NLIST,
+        nprobe=Config.GALLERY_INDEX_NPROBE
+    )
+
+gallery_cache = GalleryCache(
+    load_gallery_templates,
+    load_student_templates,
+    latest_gallery_change_id,
+    gallery_changes_since,
+    poll_interval=Config.GALLERY_POLL_INTERVAL,
+    index_factory=create_gallery_index,
+    scoped_cache_size=Config.GALLERY_SCOPE_CACHE_SIZE,
+    change_window=Config.GALLERY_CHANGE_WINDOW,
+    gap_timeout=Config.GALLERY_GAP_TIMEOUT
+)
+
+def load_day_slots(day):
+    return db.session.query(Timetable.id, Timetable.start_time, Timetable.end_time).filter(
+        Timetable.day == DayOfWeek(day)
+    ).all()
+
+def load_slot_students(timetable_ids):
+    # Students whose course and semester match a scheduled course unit
+    students = db.session.query(Student.id).join(
+        CourseUnit, CourseUnit.course_id == Student.course_id
+    ).join(
+        Timetable, (Timetable.course_unit_id == CourseUnit.id) & (Timetable.semester_id == Student.semester_id)
+    ).filter(Timetable.id.in_(list(timetable_ids))).distinct()
+    return [student_id for student_id, in students]
+
+timetable_scope = TimetableScope(
+    load_day_slots,
+    load_slot_students,
+    lead_minutes=Config.TIMETABLE_SCOPE_LEAD_MINUTES,
+    ttl=Config.TIMETABLE_SCOPE_TTL
+)
+
+def check_in_candidates(now):
+    # Students plausible at this moment, or None to search the whole gallery
+    if not Config.GALLERY_TIMETABLE_SCOPE:
+        return None
+    return timetable_scope.candidates(now)
 
 def load_existing_data(filename):
     if os.path.exists(filename):
@@ -229,7 +414,7 @@ def create_base_data():
 
 def generate_unique_email(used_emails):
     while True:
-        email = fake.email()
+        email = get_faker().email()
         if email not in used_emails:
             used_emails.add(email)
             return email
@@ -289,7 +474,7 @@ def augment_existing_data(
             student = Student(
                 user_id=user.id,
                 student_id=get_next_student_id(),
-                name=fake.name(),
+                name=get_faker().name(),
                 academic_year_id=random.choice(AcademicYear.query.all()).id,
                 course_id=random.choice(Course.query.all()).id,
                 college_id=random.choice(College.query.all()).id,
@@ -312,7 +497,7 @@ def augment_existing_data(
 
             lecturer = Lecturer(
                 user_id=user.id,
-                name=fake.name()
+                name=get_faker().name()
             )
             new_lecturers.append(lecturer)
             db.session.add(lecturer)
@@ -323,7 +508,7 @@ def augment_existing_data(
         for i in range(num_new_courses):
             course = Course(
                 code=get_next_course_code(),
-                name=fake.catch_phrase(),
+                name=get_faker().catch_phrase(),
                 college_id=random.choice(College.query.all()).id
             )
             new_courses.append(course)
@@ -431,37 +616,28 @@ def register():
                 semester_id=int(data['semester_id'])
             )
             
-            face_images = []
+            image_payloads = []
             for key, file in request.files.items():
                 if file and allowed_file(file.filename):
-                    file_data = file.read()
-                    nparr = np.frombuffer(file_data, np.uint8)
-                    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                    face_images.append(img)
+                    image_payloads.append(file.read())
 
-            if not face_images:
+            if not image_payloads:
                 return jsonify({"msg": "At least one facial image is required"}), 400
-            
-            face_encodings = []
-            face_recognition = FaceRecognition.get_instance()
-            for image in face_images:
-                faces = face_recognition.detect_faces(image)
-                if faces:
-                    aligned_face = face_recognition.align_face(image, faces[0])
-                    face_embedding = face_recognition.get_face_embedding(aligned_face)
-                    
-                    if face_embedding is not None:
-                        face_encodings.append(face_embedding.tolist())
-                    else:
-                        logger.warning(f"Failed to get face embedding for one of the images")
-                else:
-                    logger.warning(f"No face detected in one of the images")
+
+            # Decode and detect in parallel, then embed every face in a single inference call
+            from registration_pipeline import extract_face_encodings
+            from embedding_codec import encode_embeddings
+
+            face_recognition = get_face_recognition()
+            face_encodings = extract_face_encodings(face_recognition, image_payloads)
 
             if not face_encodings:
                 return jsonify({"msg": "Failed to extract valid face encodings from any of the provided images"}), 400
 
-            student.face_encoding = face_encodings
+            student.face_embeddings = encode_embeddings(face_encodings)
             db.session.add(student)
+            db.session.flush()
+            record_gallery_change(student.id)
 
         elif data['role'] == 'lecturer':
             lecturer = Lecturer(user_id=user.id, name=data['name'])
@@ -618,6 +794,10 @@ def approve_user(user_id):
     if not user:
         return jsonify({"msg": "User not found"}), 404
     user.is_approved = True
+    if user.role == 'student':
+        student = Student.query.filter_by(user_id=user.id).first()
+        if student:
+            record_gallery_change(student.id)
     db.session.commit()
     # Here you would typically send an email to the user informing them of the approval
     return jsonify({"msg": "User approved successfully"}), 200
@@ -633,6 +813,7 @@ def reject_user(user_id):
     if user.role == 'student':
         student = Student.query.filter_by(user_id=user.id).first()
         if student:
+            record_gallery_change(student.id)
             db.session.delete(student)
     elif user.role == 'lecturer':
         lecturer = Lecturer.query.filter_by(user_id=user.id).first()
@@ -966,39 +1147,115 @@ def get_admin_dashboard():
 
     return jsonify(dashboard_data), 200
 
+def kiosk_stream_stats():
+    # Totals over the connected kiosks; Socket.IO session ids are not published
+    sessions = [session.stats() for session in list(kiosk_sessions.values())]
+    totals = {key: sum(stats[key] for stats in sessions) for key in ("frames", "dropped", "recognitions", "tracks")}
+    return {"sessions": len(sessions), **totals}
+
+@app.route('/api/metrics', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_metrics():
+    return jsonify({
+        "gallery_cache": gallery_cache.stats(),
+        "timetable_scope": timetable_scope.stats(),
+        "frame_cache": _frame_cache.stats() if _frame_cache is not None else None,
+        "kiosk_streams": kiosk_stream_stats(),
+        "debug_capture": get_debug_capture().stats(),
+        "warmup": _face_recognition.warmup_timings if _face_recognition is not None else None,
+        "embedding_batcher": _face_recognition.embedding_batcher_stats() if _face_recognition is not None else None
+    }), 200
+
+@app.route('/api/ready', methods=['GET'])
+def get_ready():
+    # Never loads the model itself: a worker without face recognition is simply not ready
+    face_recognition = _face_recognition
+    ready = face_recognition is not None and face_recognition.ready.is_set()
+    return jsonify({
+        "ready": ready,
+        "warmup": face_recognition.warmup_timings if face_recognition is not None else None
+    }), 200 if ready else 503
+
 @app.route('/api/check-attendance', methods=['POST'])
 def check_attendance():
+    from image_decoding import decode_data_url_image
+
     image_data = request.json.get('image')
     
     if not image_data:
         logger.error("No image data received")
         return jsonify({"error": "No image data received"}), 400
+
+    # Kiosks can pass their own detection_max_side to tune downscaling per camera
+    try:
+        detection_max_side = parse_max_side(request.json.get('detection_max_side'))
+    except ValueError:
+        return jsonify({"error": "detection_max_side must be a non-negative integer"}), 400
     
     try:
-        # Remove the data URL prefix if present
-        if image_data.startswith('data:image'):
-            image_data = image_data.split(',')[1]
-        
-        # Decode base64 image
-        image_bytes = base64.b64decode(image_data)
-        
-        # Open image using PIL
-        img = Image.open(BytesIO(image_bytes))
-        
-        # Convert PIL Image to numpy array for OpenCV
-        img_np = np.array(img)
-        
-        # Convert RGB to BGR (OpenCV uses BGR)
-        img_np = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
-        
+        img_np = decode_data_url_image(image_data)
         logger.info(f"Image processed successfully. Shape: {img_np.shape}")
     except Exception as e:
         logger.error(f"Error processing image: {str(e)}")
         return jsonify({"error": "Failed to process image"}), 400
-    
+
+    return check_attendance_frame(img_np, detection_max_side)
+
+@app.route('/api/check-attendance/binary', methods=['POST'])
+def check_attendance_binary():
+    # Same as /api/check-attendance, but the frame arrives as raw JPEG/PNG bytes, either as the
+    # request body (application/octet-stream) or as the 'image' file of a multipart form, and is
+    # decoded straight to BGR with cv2.imdecode. decode_max_side and detection_max_side are
+    # query parameters.
+    from image_decoding import decode_image_bytes
+
+    if 'image' in request.files:
+        image_bytes = request.files['image'].read()
+    else:
+        image_bytes = request.get_data()
+
+    if not image_bytes:
+        logger.error("No image data received")
+        return jsonify({"error": "No image data received"}), 400
+    try:
+        detection_max_side = parse_max_side(request.args.get('detection_max_side'))
+    except ValueError:
+        return jsonify({"error": "detection_max_side must be a non-negative integer"}), 400
+
+    decode_max_side = request.args.get('decode_max_side', Config.UPLOAD_DECODE_MAX_SIDE, type=int)
+    img_np, decode_info = decode_image_bytes(image_bytes, max_side=decode_max_side)
+    if img_np is None:
+        return jsonify({"error": "Failed to process image"}), 400
+    logger.info(f"Image decoded. Shape: {img_np.shape}, {decode_info}")
+
+    return check_attendance_frame(img_np, detection_max_side)
+
+def check_attendance_frame(img_np, detection_max_side=None):
+    from face_quality import quality_response, score_face, score_frame
+
+    # Hopeless frames (dark, blown out, covered lens, motion blur) never reach MTCNN
+    frame_quality = score_frame(img_np)
+    if not frame_quality.ok:
+        logger.info(f"Frame rejected before detection: {frame_quality}")
+        return jsonify(quality_response(frame_quality)), 200
+
+    # Kiosk retries of the same frame reuse its detection and embedding
+    frame_cache = get_frame_cache()
+    fingerprint = frame_cache.fingerprint(img_np, detection_max_side) if frame_cache is not None else None
+    cached = frame_cache.get(fingerprint) if frame_cache is not None else None
+
     # Perform face detection and recognition
-    face_recognition = FaceRecognition.get_instance()
-    faces = face_recognition.detect_faces(img_np)
+    face_recognition = get_face_recognition()
+    if cached is not None:
+        faces, face_embedding = cached
+        logger.info("Reusing detection and embedding of a recently submitted frame")
+    else:
+        faces, detection_timings = face_recognition.detect_faces_timed(img_np, max_side=detection_max_side)
+        logger.info(f"Detection timings: {detection_timings}")
+        face_embedding = None
+        if frame_cache is not None:
+            frame_cache.put(fingerprint, (faces, None))
     
     if not faces:
         logger.info("No face detected in the image")
@@ -1009,43 +1266,40 @@ def check_attendance():
         return jsonify({"warning": "Multiple faces detected. Please ensure only one person is in the frame."}), 200
     
     face = faces[0]
-    aligned_face = face_recognition.align_face(img_np, face)
-    
-    # Check face quality
-    if not face_recognition.check_face_quality(aligned_face):
-        return jsonify({"message": "Poor quality image. Please try again with better lighting and less blur."}), 200
-    
-    face_embedding = face_recognition.get_face_embedding(aligned_face)
+
+    # Check face quality on the detected box before aligning and embedding it
+    face_quality = score_face(img_np, face)
+    if not face_quality.ok:
+        logger.info(f"Face rejected before embedding: {face_quality}")
+        return jsonify(quality_response(face_quality)), 200
+
+    if face_embedding is None:
+        aligned_face = face_recognition.align_face(img_np, face)
+        face_embedding = face_recognition.get_face_embedding(aligned_face)
+        if face_embedding is not None and frame_cache is not None:
+            frame_cache.put(fingerprint, (faces, face_embedding))
     
     if face_embedding is None:
         return jsonify({"error": "Failed to generate face embedding"}), 500
     
     # Find matching student
-    all_students = Student.query.all()
-    
+    matching_student_id, best_match_distance = gallery_cache.match(
+        face_embedding,
+        candidates=check_in_candidates(datetime.now()),
+        threshold=Config.RECOGNITION_THRESHOLD
+    )
+    logger.info(f"Best gallery match: student={matching_student_id}, distance={best_match_distance}")
+
     matching_student = None
-    best_match_distance = float('inf')
-    for student in all_students:
-        # Skip the first student 
-        if student.id == 1:
-            continue
-        if student.face_encoding:
-            try:
-                stored_embeddings = [np.array(emb) for emb in student.face_encoding]
-                is_match, distance = face_recognition.recognize_face(face_embedding, stored_embeddings)
-                logger.info(f"Student {student.id}: match={is_match}, distance={distance}")
-                if is_match and distance < best_match_distance:
-                    best_match_distance = distance
-                    matching_student = student
-            except Exception as e:
-                logger.error(f"Error comparing faces for student {student.id}: {str(e)}")
-                continue
-    
+    if matching_student_id is not None:
+        matching_student = Student.query.get(matching_student_id)
+
     if matching_student is None:
         return jsonify({"message": "Face not recognized as a registered student"}), 200
 
-    now = datetime.now()
-    
+    return jsonify(student_check_in_response(matching_student, datetime.now())), 200
+
+def student_check_in_response(matching_student, now):
     # Check for active sessions
     active_session = Attendance.query.filter_by(student_id=matching_student.user_id, check_out_time=None).first()
     
@@ -1122,7 +1376,216 @@ def check_attendance():
             "room": class_.room
         })
 
-    return jsonify(response_data), 200
+    return response_data
+
+def record_group_attendance(students, now):
+    # Check in every student whose class is in progress (or starts within 30 minutes) with one
+    # timetable query, one attendance query and one commit. Returns {student.id: status}.
+    today = DayOfWeek(now.strftime('%A'))
+    window_start = (now + timedelta(minutes=30)).time()
+    slots = Timetable.query.join(CourseUnit).filter(
+        CourseUnit.course_id.in_({student.course_id for student in students}),
+        Timetable.day == today,
+        Timetable.start_time <= window_start,
+        Timetable.end_time >= now.time()
+    ).order_by(Timetable.start_time).all()
+
+    existing = {
+        (attendance.student_id, attendance.timetable_id)
+        for attendance in Attendance.query.filter(
+            Attendance.student_id.in_([student.user_id for student in students]),
+            Attendance.timetable_id.in_([slot.id for slot in slots] or [-1]),
+            Attendance.date == now.date()
+        )
+    }
+
+    statuses = {}
+    for student in students:
+        slot = next((slot for slot in slots
+                     if slot.course_unit.course_id == student.course_id and slot.semester_id == student.semester_id), None)
+        if slot is None:
+            statuses[student.id] = ("no_active_class", None)
+        elif (student.user_id, slot.id) in existing:
+            statuses[student.id] = ("already_checked_in", slot)
+        else:
+            db.session.add(Attendance(student_id=student.user_id, timetable_id=slot.id, date=now.date(), check_in_time=now))
+            statuses[student.id] = ("checked_in", slot)
+    db.session.commit()
+    return statuses
+
+@app.route('/api/check-attendance/group', methods=['POST'])
+def check_attendance_group():
+    # Check in every face in the frame: one batched embedding call, one vectorized gallery match
+    # and one attendance transaction for the whole group
+    from image_decoding import decode_data_url_image
+    from face_quality import quality_response, score_face, score_frame
+
+    image_data = request.json.get('image')
+    if not image_data:
+        logger.error("No image data received")
+        return jsonify({"error": "No image data received"}), 400
+    try:
+        detection_max_side = parse_max_side(request.json.get('detection_max_side'))
+    except ValueError:
+        return jsonify({"error": "detection_max_side must be a non-negative integer"}), 400
+
+    try:
+        img_np = decode_data_url_image(image_data)
+    except Exception as e:
+        logger.error(f"Error processing image: {str(e)}")
+        return jsonify({"error": "Failed to process image"}), 400
+
+    frame_quality = score_frame(img_np)
+    if not frame_quality.ok:
+        return jsonify({**quality_response(frame_quality), "faces": []}), 200
+
+    face_recognition = get_face_recognition()
+    faces, detection_timings = face_recognition.detect_faces_timed(img_np, max_side=detection_max_side)
+    logger.info(f"Group check-in: {len(faces)} faces, detection timings: {detection_timings}")
+    if not faces:
+        return jsonify({"message": "No face detected", "faces": []}), 200
+
+    results = [{"box": [int(v) for v in face['box']], "status": None} for face in faces]
+    aligned_faces, aligned_results = [], []
+    for face, result in zip(faces, results):
+        face_quality = score_face(img_np, face)
+        if face_quality.ok:
+            aligned_faces.append(face_recognition.align_face(img_np, face))
+            aligned_results.append(result)
+        else:
+            result["status"] = "poor_quality"
+            result["reason"] = face_quality.reason
+
+    if aligned_faces:
+        face_embeddings = face_recognition.get_face_embeddings_batch(aligned_faces)
+        if face_embeddings is None:
+            return jsonify({"error": "Failed to generate face embeddings"}), 500
+        matches = gallery_cache.match_batch(
+            face_embeddings,
+            candidates=check_in_candidates(datetime.now()),
+            threshold=Config.RECOGNITION_THRESHOLD
+        )
+    else:
+        matches = []
+
+    # The same student can only be checked in once per frame; keep their closest face
+    best_faces = {}
+    for result, (student_id, distance) in zip(aligned_results, matches):
+        result["distance"] = response_distance(distance)
+        if student_id is None:
+            result["status"] = "not_recognized"
+        elif student_id not in best_faces or distance < best_faces[student_id]["distance"]:
+            if student_id in best_faces:
+                best_faces[student_id]["status"] = "duplicate"
+            best_faces[student_id] = result
+        else:
+            result["status"] = "duplicate"
+
+    now = datetime.now()
+    students = Student.query.filter(Student.id.in_(list(best_faces))).all() if best_faces else []
+    try:
+        statuses = record_group_attendance(students, now) if students else {}
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error recording group attendance: {str(e)}")
+        return jsonify({"error": "Failed to record attendance"}), 500
+
+    for student in students:
+        status, slot = statuses[student.id]
+        result = best_faces[student.id]
+        result.update({"status": status, "student_id": student.student_id, "student_name": student.name})
+        if slot is not None:
+            result["course"] = slot.course_unit.name
+            result["room"] = slot.room
+    for result in results:
+        if result["status"] is None:
+            result["status"] = "not_recognized"
+
+    return jsonify({
+        "current_time": now.strftime('%Y-%m-%d %H:%M:%S'),
+        "checked_in": sum(1 for result in results if result["status"] == "checked_in"),
+        "faces": results
+    }), 200
+
+# Streaming check-in: a kiosk keeps one socket open and pushes frames as binary JPEG (or data
+# URLs) in 'frame' events. Each frame gets a 'frame_status' reply; a 'recognition' event with the
+# same payload as /api/check-attendance is pushed once per stable face (see kiosk_stream.py).
+kiosk_sessions = {}
+
+def recognize_stream_face(frame, face):
+    face_recognition = get_face_recognition()
+    face_embedding = face_recognition.get_face_embedding(face_recognition.align_face(frame, face))
+    if face_embedding is None:
+        return {"error": "Failed to generate face embedding"}
+
+    now = datetime.now()
+    student_id, distance = gallery_cache.match(
+        face_embedding,
+        candidates=check_in_candidates(now),
+        threshold=Config.RECOGNITION_THRESHOLD
+    )
+    student = Student.query.get(student_id) if student_id is not None else None
+    if student is None:
+        return {"message": "Face not recognized as a registered student", "distance": response_distance(distance)}
+    return {**student_check_in_response(student, now), "student_id": student.student_id,
+            "distance": response_distance(distance)}
+
+def decode_stream_frame(data):
+    from image_decoding import decode_data_url_image, decode_image_bytes
+
+    if isinstance(data, dict):
+        data = data.get('image')
+    if isinstance(data, str):
+        return decode_data_url_image(data)
+    if isinstance(data, (bytes, bytearray)):
+        return decode_image_bytes(bytes(data), max_side=Config.UPLOAD_DECODE_MAX_SIDE)[0]
+    return None
+
+@socketio.on('connect', namespace='/kiosk')
+def kiosk_connect():
+    from kiosk_stream import KioskSession
+
+    kiosk_sessions[request.sid] = KioskSession(
+        stable_frames=Config.STREAM_STABLE_FRAMES,
+        stable_iou=Config.STREAM_STABLE_IOU,
+        retry_frames=Config.TRACK_REVERIFY_FRAMES,
+        max_missed=Config.TRACK_MAX_MISSED,
+        iou_threshold=Config.TRACK_IOU_THRESHOLD
+    )
+    logger.info(f"Kiosk {request.sid} connected")
+
+@socketio.on('disconnect', namespace='/kiosk')
+def kiosk_disconnect():
+    session = kiosk_sessions.pop(request.sid, None)
+    if session is not None:
+        logger.info(f"Kiosk {request.sid} disconnected: {session.stats()}")
+
+@socketio.on('frame', namespace='/kiosk')
+def kiosk_frame(data):
+    session = kiosk_sessions.get(request.sid)
+    if session is None:
+        return
+    try:
+        frame = decode_stream_frame(data)
+    except Exception as e:
+        logger.error(f"Error decoding kiosk frame: {str(e)}")
+        frame = None
+    if frame is None:
+        emit('frame_status', {"state": "error", "error": "Failed to process image"})
+        return
+
+    face_recognition = get_face_recognition()
+    result = session.process(
+        frame,
+        lambda image: face_recognition.detect_faces_timed(image)[0],
+        recognize_stream_face
+    )
+    if result is None:
+        return
+    status, event = result
+    emit('frame_status', status)
+    if event is not None:
+        emit('recognition', event)
 
 
 # Admin Reporting Features
@@ -1494,4 +1957,4 @@ if __name__ == '__main__':
         #     start_date=datetime(2024, 9, 1),
         #     end_date=datetime(2024, 12, 31)
         # )
-    app.run(debug=True)
\ No newline at end of file
+    socketio.run(app, debug=True)
\ No newline at end of file
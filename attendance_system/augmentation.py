@@ -0,0 +1,44 @@
+import cv2
+import numpy as np
+
+
+class FaceAugmenter:
+    # Builds K brightness/contrast/rotation variants of an aligned face as one (K, H, W, C) array.
+    #
+    # All random parameters are drawn in one call from a seedable generator, brightness and
+    # contrast for every variant come from one vectorized lookup-table computation (bit-exact
+    # with the two cv2.convertScaleAbs calls in FaceRecognition.augment_image), and each variant
+    # is warped straight into its slot of the preallocated batch that goes to FaceNet.
+
+    def __init__(self, seed=None, brightness=(0.8, 1.2), contrast=(0.8, 1.2), max_angle=15):
+        self.rng = np.random.default_rng(seed)
+        self.brightness = brightness
+        self.contrast = contrast
+        self.max_angle = max_angle
+
+    def sample_parameters(self, count):
+        brightness = self.rng.uniform(*self.brightness, size=count)
+        contrast = self.rng.uniform(*self.contrast, size=count)
+        angles = self.rng.uniform(-self.max_angle, self.max_angle, size=count)
+        return brightness, contrast, angles
+
+    @staticmethod
+    def lookup_tables(brightness, contrast):
+        # (K, 256) uint8 tables equal to saturate(round(saturate(round(v * b)) * c))
+        values = np.arange(256, dtype=np.float64)
+        scaled = np.clip(np.rint(values[None, :] * brightness[:, None]), 0, 255)
+        return np.clip(np.rint(scaled * contrast[:, None]), 0, 255).astype(np.uint8)
+
+    def augment_batch(self, image, count, include_original=False):
+        brightness, contrast, angles = self.sample_parameters(count)
+        tables = self.lookup_tables(brightness, contrast)
+
+        h, w = image.shape[:2]
+        offset = 1 if include_original else 0
+        batch = np.empty((count + offset,) + image.shape, dtype=np.uint8)
+        if include_original:
+            batch[0] = image
+        for k in range(count):
+            M = cv2.getRotationMatrix2D((w/2, h/2), angles[k], 1)
+            cv2.warpAffine(cv2.LUT(image, tables[k]), M, (w, h), dst=batch[k + offset])
+        return batch
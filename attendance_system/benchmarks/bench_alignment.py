@@ -0,0 +1,78 @@
+# Microbenchmark of the legacy and direct face alignment paths, plus a parity check.
+#
+#   python -m benchmarks.bench_alignment        # synthetic frames, pixel parity only
+#   python -m benchmarks.bench_alignment --embed ../uploads/*.jpg
+#
+# With --embed the images are run through MTCNN and FaceNet, and the cosine distance between
+# the embeddings of the two alignments is reported for every detected face.
+import argparse
+import glob
+import os
+import cv2
+import numpy as np
+from claude_face_recognition import align_face_legacy, align_face_direct
+from config import Config
+from gallery_matcher import cosine_distances
+from benchmarks.common import REPO_ROOT, synthetic_frame, time_ms
+
+RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080), (3840, 2160)]
+
+
+def synthetic_face(width, height):
+    # Tilted face filling a third of the frame height
+    h = height // 3
+    w = int(h * 0.8)
+    x, y = (width - w) // 2, (height - h) // 2
+    return {
+        'box': [x, y, w, h],
+        'keypoints': {
+            'left_eye': (x + w * 0.3, y + h * 0.38),
+            'right_eye': (x + w * 0.7, y + h * 0.42),
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('images', nargs='*', help="images for the embedding parity check")
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--embed', action='store_true', help="compare FaceNet embeddings of both paths")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'resolution':>11} {'legacy ms':>10} {'direct ms':>10} {'speedup':>8} {'mean |dpx|':>11}")
+    for width, height in RESOLUTIONS:
+        frame = synthetic_frame(width, height, rng)
+        face = synthetic_face(width, height)
+        legacy_ms = time_ms(lambda: align_face_legacy(frame, face), args.repeats)
+        direct_ms = time_ms(lambda: align_face_direct(frame, face), args.repeats)
+        pixel_error = np.abs(align_face_legacy(frame, face).astype(np.int16) - align_face_direct(frame, face)).mean()
+        print(f"{width:>5}x{height:<5} {legacy_ms:>10.2f} {direct_ms:>10.2f} {legacy_ms / direct_ms:>7.1f}x {pixel_error:>11.3f}")
+
+    if not args.embed:
+        return
+
+    from claude_face_recognition import FaceRecognition
+    face_recognition = FaceRecognition.get_instance()
+    paths = args.images or glob.glob(os.path.join(REPO_ROOT, 'uploads', '*.jpg'))
+    distances = []
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        for face in face_recognition.detect_faces(image):
+            embeddings = face_recognition.get_face_embeddings_batch([
+                face_recognition.align_face(image, face, mode='legacy'),
+                face_recognition.align_face(image, face, mode='direct'),
+            ])
+            distances.append(float(cosine_distances(embeddings[0], embeddings[1:])[0]))
+    if distances:
+        print(f"Embedding cosine distance legacy vs direct over {len(distances)} faces: "
+              f"mean {np.mean(distances):.5f}, max {np.max(distances):.5f} "
+              f"(recognition threshold {Config.RECOGNITION_THRESHOLD})")
+    else:
+        print("No faces found for the embedding parity check")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# Recall@1 and queries per second of the approximate gallery index against exact search.
+#
+#   python -m benchmarks.bench_ann_index --sizes 10000 100000 1000000 --nprobe 4 8 16 32
+#
+# Embeddings are the synthetic gallery of benchmarks/common.py, --templates-per-identity per
+# identity, and probes are fresh noisy samples of enrolled identities. At 1M x 512 the gallery alone is 2 GB of
+# float32 and the index holds its own copy, so use --dim 128 on smaller machines.
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from ann_index import ExactIndex, IVFIndex
+from gallery_matcher import normalize_embeddings
+from benchmarks.common import synthetic_gallery, synthetic_probes
+
+
+def timed_search(index, queries, **kwargs):
+    start = time.perf_counter()
+    ids, _ = index.search(queries, k=1, **kwargs)
+    elapsed = time.perf_counter() - start
+    return ids[:, 0], len(queries) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--dim', type=int, default=512)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--templates-per-identity', type=int, default=5)
+    parser.add_argument('--separation', type=float, default=1.0)
+    parser.add_argument('--noise', type=float, default=0.8)
+    parser.add_argument('--nlist', type=int, default=None, help="default: 4 * sqrt(size)")
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'size':>9} {'index':>14} {'recall@1':>9} {'qps':>10}")
+    for size in args.sizes:
+        identities = size // args.templates_per_identity
+        identity_modes, owner_templates = synthetic_gallery(
+            identities, args.dim, rng, min_templates=args.templates_per_identity,
+            max_templates=args.templates_per_identity, separation=args.separation, noise=args.noise)
+        vectors = normalize_embeddings(np.concatenate([templates for _, templates in owner_templates]))
+        del owner_templates
+        ids = np.arange(len(vectors), dtype=np.int64)
+        queries = normalize_embeddings(synthetic_probes(identity_modes, rng.integers(0, identities, args.queries),
+                                                        args.noise, rng))
+
+        exact = ExactIndex(args.dim)
+        exact.add(ids, vectors)
+        truth, exact_qps = timed_search(exact, queries)
+        print(f"{size:>9} {'exact':>14} {1.0:>9.3f} {exact_qps:>10.1f}")
+        del exact
+
+        nlist = args.nlist or int(4 * np.sqrt(size))
+        start = time.perf_counter()
+        ivf = IVFIndex(args.dim, nlist=nlist)
+        ivf.add(ids, vectors)
+        if not ivf.is_trained:
+            ivf.train()
+        build_time = time.perf_counter() - start
+
+        for nprobe in args.nprobe:
+            found, qps = timed_search(ivf, queries, nprobe=nprobe)
+            recall = float(np.mean(found == truth))
+            print(f"{size:>9} {f'ivf/{nprobe}':>14} {recall:>9.3f} {qps:>10.1f}")
+
+        # Round-trip through disk to check persistence
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'ivf.npz')
+            start = time.perf_counter()
+            ivf.save(path)
+            loaded = IVFIndex.load(path)
+            io_time = time.perf_counter() - start
+            found, _ = timed_search(loaded, queries)
+            assert np.array_equal(found, timed_search(ivf, queries)[0]), "loaded index returned different results"
+        print(f"{size:>9} build {build_time:.2f}s (nlist={nlist}), save+load {io_time:.2f}s")
+        del ivf, loaded, vectors
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# Compares enrolment augmentation with FaceAugmenter against the per-copy loop it replaced.
+#
+#   python -m benchmarks.bench_augmentation --augmentations 10            # augmentation only
+#   python -m benchmarks.bench_augmentation --augmentations 10 --embed    # include FaceNet inference
+#
+# The loop path is FaceRecognition.augment_image plus one get_face_embedding call per copy;
+# the batch path is FaceAugmenter.augment_batch plus one get_face_embeddings_batch call.
+import argparse
+import random
+import cv2
+import numpy as np
+from augmentation import FaceAugmenter
+from claude_face_recognition import FaceRecognition
+from benchmarks.common import time_ms
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--augmentations', type=int, default=10)
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--embed', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    face = cv2.GaussianBlur(rng.integers(0, 256, (160, 160, 3), dtype=np.uint8), (9, 9), 3)
+    count = args.augmentations - 1
+
+    # Same parameters through both paths must give the same pixels
+    augmenter = FaceAugmenter(seed=args.seed)
+    brightness, contrast, angles = FaceAugmenter(seed=args.seed).sample_parameters(count)
+    batch = augmenter.augment_batch(face, count)
+    for k in range(count):
+        expected = cv2.convertScaleAbs(face, alpha=brightness[k], beta=0)
+        expected = cv2.convertScaleAbs(expected, alpha=contrast[k], beta=0)
+        M = cv2.getRotationMatrix2D((80, 80), angles[k], 1)
+        expected = cv2.warpAffine(expected, M, (160, 160))
+        assert np.array_equal(batch[k], expected), f"variant {k} differs from the OpenCV loop"
+    print(f"Parity: {count} variants identical to the convertScaleAbs/warpAffine loop")
+
+    # FaceRecognition.augment_image does not touch the instance, so no model is needed here
+    random.seed(args.seed)
+    loop_ms = time_ms(lambda: [FaceRecognition.augment_image(None, face) for _ in range(count)], args.repeats)
+    batch_ms = time_ms(lambda: augmenter.augment_batch(face, count, include_original=True), args.repeats)
+    print(f"Augmentation x{count}: loop {loop_ms:.2f}ms, batch {batch_ms:.2f}ms")
+
+    if not args.embed:
+        return
+
+    face_recognition = FaceRecognition.get_instance()
+
+    def loop_embed():
+        embeddings = [face_recognition.get_face_embedding(face)]
+        for _ in range(count):
+            embeddings.append(face_recognition.get_face_embedding(face_recognition.augment_image(face)))
+        return embeddings
+
+    loop_ms = time_ms(loop_embed, max(1, args.repeats // 10))
+    batch_ms = time_ms(lambda: face_recognition.get_multiple_embeddings(face, args.augmentations, seed=args.seed),
+                       max(1, args.repeats // 10))
+    print(f"Augment + embed x{args.augmentations}: loop {loop_ms:.1f}ms, batch {batch_ms:.1f}ms "
+          f"({loop_ms / batch_ms:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+# Parity and performance of the FaceNet inference backends.
+#
+#   python -m benchmarks.bench_backends --backends tf onnx onnx-int8 ../uploads/*.jpg
+#
+# Each backend runs in its own subprocess so peak RSS is measured in isolation. Faces are the
+# aligned detections from the given images (MTCNN runs once, in the parent), or synthetic crops
+# when no images are given. Drift is the cosine distance of each backend's embeddings to the
+# first backend listed.
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from config import Config
+from benchmarks.common import APP_DIR, measure
+
+
+def load_faces(paths, count, seed):
+    if not paths:
+        rng = np.random.default_rng(seed)
+        return rng.integers(0, 256, (count, 160, 160, 3), dtype=np.uint8)
+
+    import cv2
+    from claude_face_recognition import FaceRecognition
+
+    face_recognition = FaceRecognition.get_instance()
+    faces = []
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        faces.extend(face_recognition.align_face(image, face) for face in face_recognition.detect_faces(image))
+    return np.stack(faces[:count]) if faces else np.empty((0, 160, 160, 3), dtype=np.uint8)
+
+
+def run_worker(backend_name, faces_path, output_path, repeats):
+    from inference_backends import create_backend
+
+    faces = np.load(faces_path)
+    batch = faces.astype(np.float32) / 255.0
+
+    start = time.perf_counter()
+    backend = create_backend(backend_name)
+    load_s = time.perf_counter() - start
+
+    embeddings = backend.embed(batch)
+    single = measure([lambda face=face: backend.embed(face[None]) for face in batch[:repeats]], 1, 0, min_samples=0)
+    start = time.perf_counter()
+    backend.embed(batch)
+    batch_ms = (time.perf_counter() - start) * 1000
+
+    np.save(output_path, embeddings)
+    print(json.dumps({
+        "backend": backend_name,
+        "load_s": load_s,
+        "per_image_ms_p50": single["p50_ms"],
+        "per_image_ms_p95": single["p95_ms"],
+        "batch_per_image_ms": batch_ms / len(batch),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('images', nargs='*')
+    parser.add_argument('--backends', nargs='+', default=['tf', 'onnx', 'onnx-int8'])
+    parser.add_argument('--faces', type=int, default=32)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--faces-path', help=argparse.SUPPRESS)
+    parser.add_argument('--output-path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.faces_path, args.output_path, args.repeats)
+        return
+
+    faces = load_faces(args.images, args.faces, args.seed)
+    if len(faces) == 0:
+        print("No faces to embed")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        faces_path = os.path.join(tmp, 'faces.npy')
+        np.save(faces_path, faces)
+        reference = None
+        print(f"{len(faces)} faces, default backend {Config.INFERENCE_BACKEND}")
+        print(f"{'backend':>10} {'load s':>7} {'p50 ms':>8} {'p95 ms':>8} {'batch ms/img':>13} "
+              f"{'peak RSS MB':>12} {'drift mean':>11} {'drift max':>10}")
+        for backend_name in args.backends:
+            output_path = os.path.join(tmp, f'{backend_name}.npy')
+            result = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_backends', '--worker', backend_name,
+                 '--faces-path', faces_path, '--output-path', output_path, '--repeats', str(args.repeats)],
+                capture_output=True, text=True, cwd=APP_DIR
+            )
+            if result.returncode != 0:
+                print(f"{backend_name:>10} failed: {result.stderr.strip().splitlines()[-1:]}")
+                continue
+            stats = json.loads(result.stdout.strip().splitlines()[-1])
+            embeddings = np.load(output_path)
+            if reference is None:
+                reference = embeddings
+            a = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+            b = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+            drift = 1.0 - np.sum(a * b, axis=1)
+            print(f"{backend_name:>10} {stats['load_s']:>7.2f} {stats['per_image_ms_p50']:>8.2f} "
+                  f"{stats['per_image_ms_p95']:>8.2f} {stats['batch_per_image_ms']:>13.2f} "
+                  f"{stats['peak_rss_mb']:>12.0f} {drift.mean():>11.5f} {drift.max():>10.5f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# Latency and recall of the two-stage centroid prefilter against exhaustive template matching.
+#
+#   python -m benchmarks.bench_centroid_prefilter --students 1000 5000 --candidates 4 16 64
+#
+# Each synthetic student gets 10-30 templates (--min-templates/--max-templates) spread over a few
+# pose modes; probes are fresh noisy samples of enrolled students' modes. Lower --separation makes
+# identities harder to tell apart. recall@1 is agreement with the exhaustive top-1 owner, and
+# "decisions" is agreement of the thresholded match (owner or rejection), which is what check-in
+# acts on.
+import argparse
+import numpy as np
+from gallery_matcher import GalleryMatcher
+from benchmarks.common import synthetic_gallery, synthetic_probes, timed_matches
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--students', type=int, nargs='+', default=[1000, 5000])
+    parser.add_argument('--dim', type=int, default=512)
+    parser.add_argument('--min-templates', type=int, default=10)
+    parser.add_argument('--max-templates', type=int, default=30)
+    parser.add_argument('--candidates', type=int, nargs='+', default=[4, 16, 64])
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--modes', type=int, default=3)
+    parser.add_argument('--separation', type=float, default=1.0)
+    parser.add_argument('--noise', type=float, default=0.8)
+    parser.add_argument('--threshold', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'students':>8} {'templates':>9} {'search':>18} {'ms/query':>9} {'recall@1':>9} {'decisions':>10}")
+    for students in args.students:
+        identity_modes, owner_templates = synthetic_gallery(
+            students, args.dim, rng, min_templates=args.min_templates, max_templates=args.max_templates,
+            modes=args.modes, separation=args.separation, noise=args.noise)
+        queries = synthetic_probes(identity_modes, rng.integers(0, students, args.queries), args.noise, rng)
+
+        exact = GalleryMatcher.from_templates(owner_templates)
+        truth = [owner for owner, _ in (exact.top_k(query)[0] for query in queries)]
+        exact_decisions, exact_ms = timed_matches(lambda query: exact.match(query, threshold=args.threshold), queries)
+        print(f"{students:>8} {exact.template_count:>9} {'exhaustive':>18} {exact_ms:>9.2f} {1.0:>9.3f} {1.0:>10.3f}")
+
+        for candidates in args.candidates:
+            for fallback in (False, True):
+                matcher = GalleryMatcher.from_templates(owner_templates, centroid_candidates=candidates,
+                                                        centroid_fallback=fallback)
+                top1 = [matcher.top_k(query)[0][0] for query in queries]
+                decisions, ms = timed_matches(lambda query: matcher.match(query, threshold=args.threshold), queries)
+                recall = np.mean([a == b for a, b in zip(top1, truth)])
+                agreement = np.mean([a[0] == b[0] for a, b in zip(decisions, exact_decisions)])
+                label = f"k={candidates}" + (" +fallback" if fallback else "")
+                print(f"{students:>8} {matcher.template_count:>9} {label:>18} {ms:>9.2f} {recall:>9.3f} {agreement:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# Gallery load time and storage size for pickled float lists against the binary embedding format.
+#
+#   python -m benchmarks.bench_embedding_storage --students 50000 --templates 5 --dim 512
+#
+# Each student row is serialized the way its column stores it (PickleType pickles the list of
+# lists from face_embedding.tolist(); face_embeddings holds embedding_codec blobs), then the whole
+# gallery is decoded and built into a GalleryMatcher, which is what GalleryCache does on startup.
+import argparse
+import gc
+import pickle
+import time
+import numpy as np
+from embedding_codec import encode_embeddings, decode_embeddings
+from gallery_matcher import GalleryMatcher
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument('--templates', type=int, default=5)
+    parser.add_argument('--dim', type=int, default=512)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    gallery = rng.standard_normal((args.students, args.templates, args.dim)).astype(np.float32)
+
+    rows = {
+        'pickle': [pickle.dumps(templates.tolist(), pickle.HIGHEST_PROTOCOL) for templates in gallery],
+        'float32': [encode_embeddings(templates, dtype='float32', model_version=1) for templates in gallery],
+        'float16': [encode_embeddings(templates, dtype='float16', model_version=1) for templates in gallery],
+    }
+    decoders = {'pickle': pickle.loads, 'float32': decode_embeddings, 'float16': decode_embeddings}
+
+    print(f"{args.students} students x {args.templates} templates x {args.dim}-d")
+    reference = None
+    for name, blobs in rows.items():
+        decode = decoders[name]
+        start = time.perf_counter()
+        templates = [(student_id, decode(blob)) for student_id, blob in enumerate(blobs)]
+        decoded = time.perf_counter()
+        matcher = GalleryMatcher.from_templates(templates)
+        built = time.perf_counter()
+
+        if reference is None:
+            reference = matcher.templates
+        drift = np.abs(matcher.templates - reference).max()
+        size_mb = sum(len(blob) for blob in blobs) / 1024 ** 2
+        print(f"{name:>8}: {size_mb:8.1f} MB  decode {decoded - start:6.2f}s  build {built - decoded:6.2f}s  "
+              f"total {built - start:6.2f}s  max abs diff {drift:.2e}")
+        # Free the decoded gallery outside the timed region; the pickled one is millions of floats
+        del templates, matcher
+        gc.collect()
+
+
+if __name__ == '__main__':
+    main()
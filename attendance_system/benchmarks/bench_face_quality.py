@@ -0,0 +1,84 @@
+# Cost of the quality gate against the inference it saves on rejected frames.
+#
+#   python -m benchmarks.bench_face_quality ../uploads/*.jpg
+#   python -m benchmarks.bench_face_quality --width 1280 --height 720 --pipeline-ms 180
+#
+# Each source frame is degraded into the hopeless cases score_frame rejects before MTCNN (dark,
+# overexposed, covered lens, defocus). Saved compute per rejected frame is the detect + align
+# + embed time of the frame minus the cost of scoring it. With --models that time is measured with
+# FaceRecognition on the source frames; otherwise pass it with --pipeline-ms.
+import argparse
+import cv2
+import numpy as np
+from face_quality import score_face, score_frame
+from benchmarks.common import synthetic_frame, time_ms
+
+
+def degraded(frame):
+    return {
+        'dark': cv2.convertScaleAbs(frame, alpha=0.1),
+        'overexposed': cv2.convertScaleAbs(frame, alpha=1.0, beta=220),
+        'covered': np.full_like(frame, 90),
+        'defocus': cv2.GaussianBlur(frame, (0, 0), frame.shape[1] / 40),
+    }
+
+
+def legacy_valid_face(image):
+    # The old is_valid_face, which registration ran on the whole full-resolution frame
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return cv2.Laplacian(gray, cv2.CV_64F).var() >= 100 and 50 <= np.mean(gray) <= 200
+
+
+def pipeline_ms(face_recognition, frame, repeats):
+    # detect + align + embed, as check-in does for a frame that passes the gate
+    def run():
+        faces = face_recognition.detect_faces(frame)
+        if faces:
+            face_recognition.get_face_embedding(face_recognition.align_face(frame, faces[0]))
+        return faces
+    return time_ms(run, repeats), run()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('images', nargs='*')
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--models', action='store_true', help="measure detect + embed with FaceRecognition")
+    parser.add_argument('--pipeline-ms', type=float, default=None, help="detect + embed cost when not measured")
+    args = parser.parse_args()
+
+    frames = [(path, cv2.imread(path)) for path in args.images]
+    frames = [(path, frame) for path, frame in frames if frame is not None]
+    if not frames:
+        frames = [(f"synthetic {args.width}x{args.height}", synthetic_frame(args.width, args.height, np.random.default_rng(0)))]
+
+    face_recognition = None
+    if args.models:
+        from claude_face_recognition import FaceRecognition
+        face_recognition = FaceRecognition.get_instance()
+        face_recognition.warmup()
+
+    print(f"{'source':<28} {'case':<12} {'reason':<20} {'gate ms':>8} {'legacy ms':>9} {'pipeline ms':>11} {'saved ms':>9}")
+    for path, frame in frames:
+        saved_base = args.pipeline_ms
+        if face_recognition is not None:
+            saved_base, faces = pipeline_ms(face_recognition, frame, max(1, args.repeats // 10))
+            # A frame that passes the gate also pays for score_face on its detected face
+            if faces:
+                face_score = score_face(frame, faces[0])
+                face_ms = time_ms(lambda: score_face(frame, faces[0]), args.repeats)
+                print(f"{path[-28:]:<28} {'face':<12} {face_score.reason:<20} {face_ms:>8.3f}")
+
+        for case, image in [('original', frame)] + list(degraded(frame).items()):
+            score = score_frame(image)
+            gate_ms = time_ms(lambda: score_frame(image), args.repeats)
+            legacy_ms = time_ms(lambda: legacy_valid_face(image), args.repeats)
+            pipeline = f"{saved_base:>11.1f}" if saved_base is not None else f"{'-':>11}"
+            saved = f"{saved_base - gate_ms:>9.1f}" if saved_base is not None and not score.ok else f"{'-':>9}"
+            print(f"{path[-28:]:<28} {case:<12} {score.reason:<20} {gate_ms:>8.3f} {legacy_ms:>9.3f} {pipeline} {saved}")
+
+
+if __name__ == '__main__':
+    main()
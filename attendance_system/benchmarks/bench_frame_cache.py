@@ -0,0 +1,54 @@
+# Fingerprint cost, lookup latency and retry/near-duplicate separation of the frame cache.
+#
+#   python -m benchmarks.bench_frame_cache ../uploads/*.jpg --pipeline-ms 180
+#
+# For each frame, a retry is the same frame re-encoded as JPEG (what a kiosk resubmission looks
+# like after decoding); the other frames stand in for different people or moments. The bit
+# distances show how much margin FRAME_CACHE_MAX_DISTANCE leaves on both sides.
+import argparse
+import itertools
+import cv2
+import numpy as np
+from frame_cache import FrameCache, hash_distance
+from benchmarks.common import time_ms
+
+
+def reencoded(frame, quality):
+    return cv2.imdecode(cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1], cv2.IMREAD_COLOR)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('images', nargs='+')
+    parser.add_argument('--hash-size', type=int, default=16)
+    parser.add_argument('--max-distance', type=int, default=8)
+    parser.add_argument('--quality', type=int, default=80)
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--pipeline-ms', type=float, default=None, help="detect + embed cost a hit saves")
+    args = parser.parse_args()
+
+    frames = [frame for frame in (cv2.imread(path) for path in args.images) if frame is not None]
+    cache = FrameCache(max_entries=64, ttl=60, hash_size=args.hash_size, max_distance=args.max_distance)
+
+    fingerprint_ms = time_ms(lambda: cache.fingerprint(frames[0]), args.repeats)
+
+    keys = [cache.fingerprint(frame) for frame in frames]
+    for key in keys:
+        cache.put(key, ([], None))
+    retry_keys = [cache.fingerprint(reencoded(frame, args.quality)) for frame in frames]
+    hits = sum(cache.get(key) is not None for key in retry_keys)
+    lookup_ms = time_ms(lambda: [cache.get(key) for key in retry_keys], args.repeats) / len(retry_keys)
+
+    retry_distances = [hash_distance(a[1], b[1]) for a, b in zip(keys, retry_keys)]
+    other_distances = [hash_distance(a[1], b[1]) for a, b in itertools.combinations(keys, 2) if a[0] == b[0]]
+    print(f"frames {len(frames)} ({frames[0].shape[1]}x{frames[0].shape[0]}), {args.hash_size ** 2}-bit dHash")
+    print(f"fingerprint {fingerprint_ms:.3f}ms, lookup {lookup_ms:.3f}ms, retries hit {hits}/{len(retry_keys)}")
+    print(f"retry distance   max {max(retry_distances)}  mean {np.mean(retry_distances):.1f}")
+    if other_distances:
+        print(f"distinct frames  min {min(other_distances)}  mean {np.mean(other_distances):.1f}")
+    if args.pipeline_ms is not None:
+        print(f"saved per hit {args.pipeline_ms - fingerprint_ms - lookup_ms:.1f}ms of {args.pipeline_ms:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# Burst throughput of single-face embedding calls, one thread per simulated kiosk, with and
+# without the EmbeddingBatcher.
+#
+#   python -m benchmarks.bench_micro_batching --clients 32 --requests 20            # real FaceNet backend
+#   python -m benchmarks.bench_micro_batching --simulate 20,0.5 --clients 32        # 20ms per call + 0.5ms per face
+#
+# --simulate models a backend whose cost is a fixed per-call overhead plus a per-face cost, which
+# is how FaceNet behaves on CPU and is enough to see batching at work without the model.
+import argparse
+import threading
+import time
+import numpy as np
+from config import Config
+from embedding_batcher import EmbeddingBatcher
+
+
+def simulated_embed(overhead_ms, per_face_ms, dim=512):
+    lock = threading.Lock()
+
+    def embed(faces):
+        # The lock stands in for a backend that is saturated by one call at a time
+        with lock:
+            time.sleep((overhead_ms + per_face_ms * len(faces)) / 1000)
+        return np.zeros((len(faces), dim), dtype=np.float32)
+    return embed
+
+
+def run_burst(embed, clients, requests, face):
+    latencies = []
+    latencies_lock = threading.Lock()
+
+    def client():
+        own = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            embed([face])
+            own.append((time.perf_counter() - start) * 1000)
+        with latencies_lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return clients * requests / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--window-ms', type=float, default=Config.EMBEDDING_BATCH_WINDOW_MS or 5)
+    parser.add_argument('--max-batch', type=int, default=Config.EMBEDDING_BATCH_SIZE)
+    parser.add_argument('--simulate', help="overhead_ms,per_face_ms instead of the real backend")
+    args = parser.parse_args()
+
+    if args.simulate:
+        overhead_ms, per_face_ms = (float(value) for value in args.simulate.split(','))
+        embed = simulated_embed(overhead_ms, per_face_ms)
+    else:
+        from claude_face_recognition import FaceRecognition
+
+        face_recognition = FaceRecognition.get_instance()
+        face_recognition.warmup()
+        embed = face_recognition._embed_faces
+
+    face = np.random.default_rng(0).integers(0, 256, (160, 160, 3), dtype=np.uint8)
+    print(f"{args.clients} clients x {args.requests} single-face requests")
+
+    throughput, p50, p95 = run_burst(embed, args.clients, args.requests, face)
+    print(f"direct:   {throughput:8.1f} faces/s  p50 {p50:7.1f}ms  p95 {p95:7.1f}ms")
+
+    batcher = EmbeddingBatcher(embed, window_ms=args.window_ms, max_batch=args.max_batch)
+    throughput, p50, p95 = run_burst(batcher.embed, args.clients, args.requests, face)
+    stats = batcher.stats()
+    print(f"batched:  {throughput:8.1f} faces/s  p50 {p50:7.1f}ms  p95 {p95:7.1f}ms  "
+          f"(window {args.window_ms:g}ms, mean batch {stats['mean_batch_size']:.1f}, "
+          f"max queue depth {stats['max_queue_depth']}, p95 wait {stats['p95_wait_ms']:.1f}ms)")
+    print(f"batch sizes: {stats['batch_size_histogram']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+# Latency percentiles and throughput of every recognition stage, with baseline comparison.
+#
+#   python -m benchmarks.bench_pipeline --output bench_results.json
+#   python -m benchmarks.bench_pipeline --baseline bench_results.json            # fails on regressions
+#   python -m benchmarks.bench_pipeline --no-models --gallery-sizes 1000 10000   # stages without TF/MTCNN
+#   python -m benchmarks.bench_pipeline --url http://localhost:5000               # live /api/check-attendance
+#
+# Frames are the checked-in samples (uploads/, temp_images/, or paths given on the command line)
+# and a synthetic no-face frame, each resized to every --resolutions entry. Stages:
+#   decode             decode_image_bytes of the frame as JPEG
+#   frame_quality      score_frame, the gate in front of MTCNN
+#   detect_faces       MTCNN through detect_faces_timed
+#   align_face         on the first detected face, or a centred box when none was found
+#   check_face_quality on the aligned face; face_quality is score_face on the detected box
+#   get_face_embedding on the aligned face
+#   recognize_face     FaceRecognition.recognize_face against --templates stored embeddings
+#   gallery_match      GalleryMatcher.match for each --gallery-sizes (students x 10-30 templates)
+#   check_attendance   decode, quality gates, detect, align, embed and gallery match in-process,
+#                      as /api/check-attendance/binary runs it minus the database and frame cache
+#   http_check_attendance  the same endpoint over HTTP when --url is given
+#
+# Results are keyed stage/resolution/source (or stage/students for matching). With --baseline,
+# a stage regresses when its p50 or p95 is more than --tolerance (and --min-delta-ms) slower than
+# the baseline's, and the script exits non-zero.
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+from datetime import datetime
+import cv2
+import numpy as np
+from config import Config
+from face_quality import score_face, score_frame
+from gallery_matcher import GalleryMatcher
+from image_decoding import decode_image_bytes
+from benchmarks.common import REPO_ROOT, measure, synthetic_frame, synthetic_gallery
+
+SAMPLE_GLOBS = ('uploads/*.jpg', 'temp_images/*.jpg')
+
+
+def load_frames(paths, resolutions, seed):
+    # {(resolution label, source): [frame, ...]}, samples resized to every resolution
+    images = [image for image in (cv2.imread(path) for path in paths) if image is not None]
+    rng = np.random.default_rng(seed)
+    frames = {}
+    for width, height in resolutions:
+        label = f"{width}x{height}"
+        if images:
+            frames[(label, 'samples')] = [cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+                                          for image in images]
+        frames[(label, 'synthetic')] = [synthetic_frame(width, height, rng, cell=8)]
+    return frames
+
+
+def centred_face(frame):
+    # Stand-in detection for frames MTCNN finds no face in, so alignment and embedding still run
+    height, width = frame.shape[:2]
+    size = min(width, height) // 2
+    x, y = (width - size) // 2, (height - size) // 2
+    return {
+        'box': [x, y, size, size],
+        'confidence': 1.0,
+        'keypoints': {
+            'left_eye': (x + size * 0.3, y + size * 0.4), 'right_eye': (x + size * 0.7, y + size * 0.4),
+            'nose': (x + size * 0.5, y + size * 0.55),
+            'mouth_left': (x + size * 0.35, y + size * 0.75), 'mouth_right': (x + size * 0.65, y + size * 0.75),
+        },
+    }
+
+
+def synthetic_matcher(students, dim, rng):
+    _, owner_templates = synthetic_gallery(students, dim, rng)
+    return GalleryMatcher.from_templates(
+        owner_templates,
+        centroid_candidates=Config.GALLERY_CENTROID_CANDIDATES,
+        centroid_fallback=Config.GALLERY_CENTROID_FALLBACK
+    )
+
+
+def check_attendance_path(face_recognition, gallery, jpeg):
+    frame, _ = decode_image_bytes(jpeg, max_side=Config.UPLOAD_DECODE_MAX_SIDE)
+    if not score_frame(frame).ok:
+        return 'frame_rejected'
+    faces, _ = face_recognition.detect_faces_timed(frame)
+    if len(faces) != 1:
+        return 'no_single_face'
+    if not score_face(frame, faces[0]).ok:
+        return 'face_rejected'
+    embedding = face_recognition.get_face_embedding(face_recognition.align_face(frame, faces[0]))
+    if embedding is None:
+        return 'embedding_failed'
+    owner, _ = gallery.match(embedding, threshold=Config.RECOGNITION_THRESHOLD)
+    return 'matched' if owner is not None else 'not_recognized'
+
+
+def http_check_attendance(url, jpeg):
+    from urllib.request import Request, urlopen
+
+    request = Request(f"{url.rstrip('/')}/api/check-attendance/binary", data=jpeg,
+                      headers={'Content-Type': 'application/octet-stream'})
+    with urlopen(request) as response:
+        return response.read()
+
+
+def run(args):
+    results = {}
+    frames = load_frames(args.images, args.resolutions, args.seed)
+    rng = np.random.default_rng(args.seed)
+
+    face_recognition = None
+    if not args.no_models:
+        from claude_face_recognition import FaceRecognition
+        face_recognition = FaceRecognition.get_instance()
+        face_recognition.warmup()
+
+    galleries = {students: synthetic_matcher(students, args.dim, rng) for students in args.gallery_sizes}
+    for (resolution, source), group in frames.items():
+        key = f"{resolution}/{source}"
+        jpegs = [cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes() for frame in group]
+        results[f"decode/{key}"] = measure([lambda jpeg=jpeg: decode_image_bytes(jpeg) for jpeg in jpegs],
+                                           args.repeats, args.warmup)
+        results[f"frame_quality/{key}"] = measure([lambda frame=frame: score_frame(frame) for frame in group],
+                                                  args.repeats, args.warmup)
+
+        if face_recognition is None:
+            detections = [centred_face(frame) for frame in group]
+        else:
+            results[f"detect_faces/{key}"] = measure(
+                [lambda frame=frame: face_recognition.detect_faces_timed(frame) for frame in group],
+                args.repeats, args.warmup)
+            detections = [(face_recognition.detect_faces(frame) or [centred_face(frame)])[0] for frame in group]
+        results[f"face_quality/{key}"] = measure(
+            [lambda frame=frame, face=face: score_face(frame, face) for frame, face in zip(group, detections)],
+            args.repeats, args.warmup)
+        if face_recognition is None:
+            continue
+
+        results[f"align_face/{key}"] = measure(
+            [lambda frame=frame, face=face: face_recognition.align_face(frame, face)
+             for frame, face in zip(group, detections)],
+            args.repeats, args.warmup)
+        aligned = [face_recognition.align_face(frame, face) for frame, face in zip(group, detections)]
+        results[f"check_face_quality/{key}"] = measure(
+            [lambda face=face: face_recognition.check_face_quality(face) for face in aligned], args.repeats, args.warmup)
+        results[f"get_face_embedding/{key}"] = measure(
+            [lambda face=face: face_recognition.get_face_embedding(face) for face in aligned], args.repeats, args.warmup)
+
+        gallery = galleries[max(args.gallery_sizes)]
+        outcomes = {}
+        for jpeg in jpegs:
+            outcome = check_attendance_path(face_recognition, gallery, jpeg)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        results[f"check_attendance/{key}"] = {
+            **measure([lambda jpeg=jpeg: check_attendance_path(face_recognition, gallery, jpeg) for jpeg in jpegs],
+                      args.repeats, args.warmup),
+            "students": max(args.gallery_sizes),
+            "outcomes": outcomes,
+        }
+        if args.url:
+            results[f"http_check_attendance/{key}"] = measure(
+                [lambda jpeg=jpeg: http_check_attendance(args.url, jpeg) for jpeg in jpegs], args.repeats, args.warmup)
+
+    probes = rng.standard_normal((args.probes, args.dim), dtype=np.float32)
+    if face_recognition is not None:
+        templates = rng.standard_normal((args.templates, args.dim), dtype=np.float32)
+        results[f"recognize_face/{args.templates}"] = measure(
+            [lambda probe=probe: face_recognition.recognize_face(probe, templates) for probe in probes],
+            max(1, args.repeats // 5), args.warmup)
+    for students, gallery in galleries.items():
+        results[f"gallery_match/{students}"] = {
+            **measure([lambda probe=probe: gallery.match(probe, threshold=Config.RECOGNITION_THRESHOLD)
+                       for probe in probes], max(1, args.repeats // 5), args.warmup),
+            "templates": gallery.template_count,
+        }
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    # Returns the keys whose p50 or p95 regressed by more than tolerance; differences under
+    # min_delta_ms are timer and scheduler noise on sub-millisecond stages
+    def slower(metric, current, previous):
+        return current[metric] - previous[metric] > max(previous[metric] * tolerance, min_delta_ms)
+
+    def faster(metric, current, previous):
+        return previous[metric] - current[metric] > max(previous[metric] * tolerance, min_delta_ms)
+
+    regressions = []
+    print(f"{'stage':<44} {'p50 ms':>9} {'base':>9} {'p95 ms':>9} {'base':>9}  status")
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            print(f"{key:<44} {current['p50_ms']:>9.3f} {'-':>9} {current['p95_ms']:>9.3f} {'-':>9}  new")
+            continue
+        regressed = any(slower(metric, current, previous) for metric in ('p50_ms', 'p95_ms'))
+        improved = all(faster(metric, current, previous) for metric in ('p50_ms', 'p95_ms'))
+        status = "REGRESSION" if regressed else "faster" if improved else "ok"
+        if regressed:
+            regressions.append(key)
+        print(f"{key:<44} {current['p50_ms']:>9.3f} {previous['p50_ms']:>9.3f} "
+              f"{current['p95_ms']:>9.3f} {previous['p95_ms']:>9.3f}  {status}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('images', nargs='*', help="defaults to the samples in uploads/ and temp_images/")
+    parser.add_argument('--resolutions', nargs='+', default=['640x480', '1280x720', '1920x1080'])
+    parser.add_argument('--gallery-sizes', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--templates', type=int, default=30, help="stored embeddings for recognize_face")
+    parser.add_argument('--dim', type=int, default=512)
+    parser.add_argument('--probes', type=int, default=50)
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--no-models', action='store_true', help="skip the stages that need TF and MTCNN")
+    parser.add_argument('--url', default=None, help="also time /api/check-attendance/binary on a running server")
+    parser.add_argument('--output', default=None, help="write results as JSON (use as a later --baseline)")
+    parser.add_argument('--baseline', default=None, help="JSON from an earlier --output to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="allowed slowdown, 0.15 = 15%%")
+    parser.add_argument('--min-delta-ms', type=float, default=0.5, help="ignore slowdowns smaller than this")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if not args.images:
+        args.images = sorted(path for pattern in SAMPLE_GLOBS for path in glob.glob(os.path.join(REPO_ROOT, pattern)))
+    args.resolutions = [tuple(int(v) for v in resolution.split('x')) for resolution in args.resolutions]
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "backend": None if args.no_models else Config.INFERENCE_BACKEND,
+            "images": len(args.images),
+            "repeats": args.repeats,
+        },
+        "results": run(args),
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report["results"], baseline["results"], args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"{len(regressions)} stages regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+    elif not args.output:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# Check-in latency with the timetable-scoped gallery against a search of every student.
+#
+#   python -m benchmarks.bench_timetable_scope --students 5000 20000 --scope 100 500
+#
+# Probes are enrolled students, --in-scope of them from the scoped candidate set (the class that
+# is on) and the rest from elsewhere on campus, which miss the scope and fall back to the full
+# gallery. "decisions" is agreement with the unscoped match.
+import argparse
+import numpy as np
+from gallery_cache import GalleryCache
+from benchmarks.common import synthetic_gallery, synthetic_probes, timed_matches
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--students', type=int, nargs='+', default=[5000, 20000])
+    parser.add_argument('--scope', type=int, nargs='+', default=[100, 500])
+    parser.add_argument('--in-scope', type=float, default=0.95)
+    parser.add_argument('--dim', type=int, default=512)
+    parser.add_argument('--min-templates', type=int, default=10)
+    parser.add_argument('--max-templates', type=int, default=30)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--separation', type=float, default=1.0)
+    parser.add_argument('--noise', type=float, default=0.8)
+    parser.add_argument('--centroid-candidates', type=int, default=16)
+    parser.add_argument('--threshold', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'students':>8} {'scope':>6} {'search':>10} {'ms/query':>9} {'fallbacks':>10} {'decisions':>10}")
+    for students in args.students:
+        identity_modes, owner_templates = synthetic_gallery(
+            students, args.dim, rng, min_templates=args.min_templates, max_templates=args.max_templates,
+            separation=args.separation, noise=args.noise)
+        cache = GalleryCache(lambda: owner_templates, None, lambda: 0, lambda change_id: [], poll_interval=float('inf'))
+        cache.refresh()
+        cache.gallery.centroid_candidates = args.centroid_candidates
+
+        for scope in args.scope:
+            candidates = frozenset(rng.choice(students, scope, replace=False).tolist())
+            in_scope = rng.random(args.queries) < args.in_scope
+            probe_owners = np.where(in_scope, rng.choice(sorted(candidates), args.queries),
+                                    rng.integers(0, students, args.queries))
+            queries = synthetic_probes(identity_modes, probe_owners, args.noise, rng)
+
+            full, full_ms = timed_matches(lambda query: cache.match(query, threshold=args.threshold), queries)
+            print(f"{students:>8} {scope:>6} {'full':>10} {full_ms:>9.2f} {'-':>10} {1.0:>10.3f}")
+            # First call builds and caches the slot's sub-gallery, as the first check-in of a class does
+            cache.match(queries[0], candidates=candidates, threshold=args.threshold)
+            fallbacks = cache.scoped_fallbacks
+            scoped, scoped_ms = timed_matches(
+                lambda query: cache.match(query, candidates=candidates, threshold=args.threshold), queries)
+            agreement = np.mean([a[0] == b[0] for a, b in zip(scoped, full)])
+            print(f"{students:>8} {scope:>6} {'scoped':>10} {scoped_ms:>9.2f} "
+                  f"{cache.scoped_fallbacks - fallbacks:>10} {agreement:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
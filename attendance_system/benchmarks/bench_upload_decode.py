@@ -0,0 +1,52 @@
+# Payload size and decode time of the JSON data-URL check-in path against binary uploads.
+#
+#   python -m benchmarks.bench_upload_decode ../uploads/*.jpg
+#   python -m benchmarks.bench_upload_decode --width 1920 --height 1080 --max-side 640
+#
+# JSON is what /api/check-attendance does (base64 data URL -> PIL -> numpy -> cvtColor); binary
+# is /api/check-attendance/binary with a full decode and with reduced decode for --max-side.
+import argparse
+import base64
+import json
+import cv2
+import numpy as np
+from image_decoding import decode_data_url_image, decode_image_bytes
+from benchmarks.common import synthetic_frame, time_ms
+
+
+def synthetic_jpeg(width, height, seed, quality=90):
+    frame = synthetic_frame(width, height, np.random.default_rng(seed))
+    return cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('images', nargs='*')
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--max-side', type=int, default=640)
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    payloads = [(path, open(path, 'rb').read()) for path in args.images]
+    if not payloads:
+        payloads = [(f"synthetic {args.width}x{args.height}", synthetic_jpeg(args.width, args.height, 0))]
+
+    for name, jpeg in payloads:
+        body = json.dumps({"image": "data:image/jpeg;base64," + base64.b64encode(jpeg).decode()})
+        frame = decode_data_url_image(json.loads(body)['image'])
+        full, _ = decode_image_bytes(jpeg)
+        reduced, info = decode_image_bytes(jpeg, max_side=args.max_side)
+        json_ms = time_ms(lambda: decode_data_url_image(json.loads(body)['image']), args.repeats)
+        full_ms = time_ms(lambda: decode_image_bytes(jpeg), args.repeats)
+        reduced_ms = time_ms(lambda: decode_image_bytes(jpeg, max_side=args.max_side), args.repeats)
+
+        print(name)
+        print(f"  json:            {len(body):>9} bytes  {json_ms:7.2f}ms  -> {frame.shape}")
+        print(f"  binary:          {len(jpeg):>9} bytes  {full_ms:7.2f}ms  -> {full.shape}")
+        print(f"  binary reduced:  {len(jpeg):>9} bytes  {reduced_ms:7.2f}ms  -> {reduced.shape} "
+              f"(1/{info['reduction']} for max side {args.max_side})")
+
+
+if __name__ == '__main__':
+    main()
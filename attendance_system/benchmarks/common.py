@@ -0,0 +1,85 @@
+# Helpers shared by the benchmark scripts. The scripts are run as modules from attendance_system/,
+# so the app modules import exactly as they do for the server:
+#
+#   cd attendance_system
+#   python -m benchmarks.bench_pipeline --no-models
+import os
+import time
+import cv2
+import numpy as np
+from gallery_matcher import normalize_embeddings
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(APP_DIR)
+
+
+def summarize(samples):
+    ms = np.asarray(samples) * 1000
+    return {
+        "n": len(samples),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "throughput_per_s": float(len(samples) / max(ms.sum() / 1000, 1e-12)),
+    }
+
+
+def measure(fns, repeats, warmup, min_samples=30):
+    # Round-robin over fns (one per frame) so the percentiles cover every frame of the group;
+    # small groups get extra rounds so p95/p99 come from at least min_samples timings
+    for fn in fns[:warmup]:
+        fn()
+    samples = []
+    for _ in range(max(repeats, -(-min_samples // len(fns)))):
+        for fn in fns:
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def time_ms(fn, repeats):
+    # Mean milliseconds per call over repeats calls, after one untimed call
+    return measure([fn], repeats, warmup=1, min_samples=0)["mean_ms"]
+
+
+def synthetic_frame(width, height, rng, cell=16):
+    # Coarse noise upscaled with cubic interpolation: smooth enough to compress like a photo,
+    # with enough edges to pass the blur gates
+    noise = rng.integers(0, 256, (height // cell, width // cell, 3), dtype=np.uint8)
+    return cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC)
+
+
+def synthetic_gallery(students, dim, rng, min_templates=10, max_templates=30, modes=3, separation=1.0, noise=0.8):
+    # Identities share a common direction (faces look alike to FaceNet far more than random
+    # vectors do) and each one has a few pose/lighting modes that its templates scatter around,
+    # so an identity's centroid is a blurred summary of its templates.
+    # Returns (identity_modes of shape (students, modes, dim), [(owner, templates), ...]).
+    common = rng.standard_normal(dim, dtype=np.float32)
+    common /= np.linalg.norm(common)
+    centres = normalize_embeddings(common + separation * rng.standard_normal((students, dim), dtype=np.float32) / np.sqrt(dim))
+    identity_modes = normalize_embeddings(
+        np.repeat(centres, modes, axis=0) + noise * rng.standard_normal((students * modes, dim), dtype=np.float32) / np.sqrt(dim)
+    ).reshape(students, modes, dim)
+    counts = rng.integers(min_templates, max_templates + 1, students)
+    owner_templates = []
+    for owner, count in enumerate(counts):
+        picks = identity_modes[owner, rng.integers(0, modes, count)]
+        templates = picks + 0.5 * noise * rng.standard_normal((count, dim), dtype=np.float32) / np.sqrt(dim)
+        owner_templates.append((owner, templates))
+    return identity_modes, owner_templates
+
+
+def synthetic_probes(identity_modes, owners, noise, rng):
+    # Fresh samples of the given enrolled identities, one per owner, from a random mode each
+    _, modes, dim = identity_modes.shape
+    probes = identity_modes[owners, rng.integers(0, modes, len(owners))]
+    return probes + 0.5 * noise * rng.standard_normal((len(owners), dim), dtype=np.float32) / np.sqrt(dim)
+
+
+def timed_matches(match, queries):
+    # One query per call, as /api/check-attendance does; returns (results, ms per query)
+    start = time.perf_counter()
+    results = [match(query) for query in queries]
+    return results, (time.perf_counter() - start) / len(queries) * 1000
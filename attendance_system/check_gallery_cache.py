@@ -0,0 +1,117 @@
+# Regression check for GalleryCache incremental refreshes, for CI or a pre-deploy check.
+#
+#   python check_gallery_cache.py
+#
+# Drives a GalleryCache over an in-memory student table holding embedding_codec blobs, the way
+# api_v3 loads them, through a full load, register / re-register / remove changes and a change
+# whose id was reserved before an already-applied one but committed after it, and exits with
+# status 1 if any refresh raises, the gallery disagrees with the table, or idle polls still read
+# change rows.
+import sys
+import numpy as np
+from embedding_codec import decode_embeddings, encode_embeddings
+from gallery_cache import GalleryCache
+
+
+class StudentTable:
+    # Stands in for the Student and GalleryChange tables
+    def __init__(self):
+        self.blobs = {}
+        self.changes = []
+        self.next_id = 1
+        # Rows returned by changes_since, to check polls read only new and late changes
+        self.polled_rows = 0
+
+    def reserve(self):
+        # A change id taken by a transaction that has not committed yet
+        change_id = self.next_id
+        self.next_id += 1
+        return change_id
+
+    def write(self, student_id, blob, change_id=None):
+        if blob is None:
+            self.blobs.pop(student_id, None)
+        else:
+            self.blobs[student_id] = blob
+        self.changes.append((change_id or self.reserve(), student_id))
+        self.changes.sort()
+
+    def load_all(self):
+        return [(student_id, decode_embeddings(blob)) for student_id, blob in self.blobs.items()]
+
+    def load_students(self, student_ids):
+        return {student_id: decode_embeddings(self.blobs[student_id])
+                for student_id in student_ids if student_id in self.blobs}
+
+    def latest_change_id(self):
+        return self.changes[-1][0] if self.changes else 0
+
+    def changes_since(self, change_id, gaps=()):
+        self.polled_rows += sum(change[0] > change_id or change[0] in gaps for change in self.changes)
+        return [change for change in self.changes if change[0] > change_id or change[0] in gaps]
+
+
+def check(cache, table, rng, dim):
+    errors = []
+    cache.refresh()
+    if set(cache.gallery.owners) != set(table.blobs):
+        errors.append(f"gallery holds {sorted(cache.gallery.owners)}, table {sorted(table.blobs)}")
+    if cache.last_change_id != table.latest_change_id():
+        errors.append(f"last_change_id {cache.last_change_id}, table {table.latest_change_id()}")
+    for student_id, blob in table.blobs.items():
+        probe = np.asarray(decode_embeddings(blob)[0], dtype=np.float32)
+        owner, _ = cache.match(probe + 0.01 * rng.standard_normal(dim, dtype=np.float32), threshold=0.5)
+        if owner != student_id:
+            errors.append(f"student {student_id} matched {owner}")
+    return errors
+
+
+def late_commit(cache, table, rng, dim):
+    # Student 7's id is reserved first, student 8 commits and is applied, then student 7 commits
+    change_id = table.reserve()
+    table.write(8, encode_embeddings(rng.standard_normal((3, dim), dtype=np.float32)))
+    cache.refresh()
+    table.write(7, encode_embeddings(rng.standard_normal((3, dim), dtype=np.float32)), change_id)
+
+
+def main():
+    dim = 128
+    rng = np.random.default_rng(0)
+    table = StudentTable()
+    for student_id in range(1, 6):
+        table.write(student_id, encode_embeddings(rng.standard_normal((3, dim), dtype=np.float32)))
+    cache = GalleryCache(table.load_all, table.load_students, table.latest_change_id, table.changes_since)
+
+    steps = [
+        ("full load", lambda: None),
+        ("register", lambda: table.write(6, encode_embeddings(rng.standard_normal((4, dim), dtype=np.float32)))),
+        ("re-register float16", lambda: table.write(2, encode_embeddings(
+            rng.standard_normal((2, dim), dtype=np.float32), dtype='float16'))),
+        ("reject", lambda: table.write(3, None)),
+        ("late commit", lambda: late_commit(cache, table, rng, dim)),
+    ]
+    failed = False
+    for name, step in steps:
+        try:
+            step()
+            errors = check(cache, table, rng, dim)
+        except Exception as e:
+            errors = [f"{type(e).__name__}: {e}"]
+        print(f"{name:<20} {'ok' if not errors else 'FAILED'}")
+        for error in errors:
+            print(f"  {error}")
+        failed = failed or bool(errors)
+
+    # With nothing new and no gaps left, a poll reads no change rows at all
+    table.polled_rows = 0
+    for _ in range(10):
+        cache.refresh()
+    idle = table.polled_rows == 0
+    print(f"{'idle polls':<20} {'ok' if idle else 'FAILED'}")
+    if not idle:
+        print(f"  10 idle polls read {table.polled_rows} change rows")
+    sys.exit(1 if failed or not idle else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# Import-time budget for the API module, for CI or a pre-deploy check.
+#
+#   python check_import_time.py                       # api_v3 within 1000ms, no heavy modules
+#   python check_import_time.py --module api_v3 --budget-ms 500
+#
+# Runs `python -X importtime -c "import <module>"` in a fresh interpreter with face recognition
+# loading disabled (as in a report-only deployment), prints the slowest imports and exits with
+# status 1 if the module's cumulative import time exceeds the budget or if any of the heavy
+# libraries that are meant to load lazily was imported.
+import argparse
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = ('tensorflow', 'cv2', 'mtcnn', 'numpy', 'scipy', 'PIL', 'faker')
+
+
+def parse_importtime(stderr):
+    # Lines look like "import time:       412 |       1290 |   package.module"
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace('import time:', '|', 1).split('|'))
+        timings[name] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--module', default='api_v3')
+    parser.add_argument('--budget-ms', type=float, default=1000)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    env = dict(os.environ, LOAD_FACE_RECOGNITION='false')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {args.module}'],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    timings = parse_importtime(result.stderr)
+    if result.returncode != 0 or args.module not in timings:
+        print(f"Importing {args.module} failed:\n{result.stderr[-2000:]}")
+        sys.exit(1)
+
+    print("Slowest imports (cumulative):")
+    for name, (_, cumulative_us) in sorted(timings.items(), key=lambda item: -item[1][1])[:args.top]:
+        print(f"  {cumulative_us / 1000:>9.1f}ms  {name}")
+
+    total_ms = timings[args.module][1] / 1000
+    heavy = sorted({name.split('.')[0] for name in timings} & set(HEAVY_MODULES))
+    print(f"{args.module}: {total_ms:.1f}ms (budget {args.budget_ms:.0f}ms)")
+
+    failed = False
+    if total_ms > args.budget_ms:
+        print("FAIL: import time is over budget")
+        failed = True
+    if heavy:
+        print(f"FAIL: heavy modules imported eagerly: {', '.join(heavy)}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -23,8 +23,8 @@ from sqlalchemy import func, distinct, case
 from pytz import timezone
 
 
-# Import the FaceRecognition class
-from claude_face_recognition import FaceRecognition
+# FaceRecognition in this process, or a client of inference_server.py when USE_INFERENCE_SERVER is set
+from inference_client import load_face_recognition
 
 app = Flask(__name__)
 # CORS(app, resources={r"/api/*": {"origins": "http://localhost:5173"}})
@@ -45,7 +45,7 @@ migrate = Migrate(app, db)
 jwt = JWTManager(app)
 
 # Initialize FaceRecognition
-face_recognition = FaceRecognition.get_instance()
+face_recognition = load_face_recognition()
 
 # Logging configuration
 logging.basicConfig(level=logging.INFO,
@@ -635,8 +635,7 @@ def start_student_session():
         logger.info(f"Detected faces: {len(faces)}")
 
         if not faces:
-            # Save the problematic image for debugging
-            cv2.imwrite('debug_image.jpg', image)
+            # detect_faces already offered the problematic image to the debug capture spool
             return jsonify({"error": "No face detected in the image"}), 400
 
         aligned_face = face_recognition.align_face(image, faces[0])
@@ -1,16 +1,64 @@
-import tensorflow as tf
 import cv2
 import numpy as np
 from scipy.spatial.distance import cosine
 import logging
 from config import Config
+from gallery_matcher import cosine_distances
+from debug_capture import get_debug_capture
+from augmentation import FaceAugmenter
+from inference_backends import create_backend
+from embedding_batcher import EmbeddingBatcher
+from face_quality import score_face, score_frame
 from mtcnn import MTCNN
 from PIL import Image
 import random
+import threading
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def face_rotation_matrix(face):
+    # Rotation about the box centre by the angle of the eye line, as used for enrolment
+    bounding_box = face['box']
+    keypoints = face['keypoints']
+
+    left_eye = keypoints['left_eye']
+    right_eye = keypoints['right_eye']
+
+    # Calculate angle
+    dY = right_eye[1] - left_eye[1]
+    dX = right_eye[0] - left_eye[0]
+    angle = np.degrees(np.arctan2(dY, dX)) - 180
+
+    # Get the center of the face
+    center = (bounding_box[0] + bounding_box[2]//2, bounding_box[1] + bounding_box[3]//2)
+    return cv2.getRotationMatrix2D(center, angle, 1)
+
+def align_face_legacy(image, face, size=160):
+    # Rotate the whole frame, then cut out the box and resize it
+    M = face_rotation_matrix(face)
+    aligned_image = cv2.warpAffine(image, M, (image.shape[1], image.shape[0]), flags=cv2.INTER_CUBIC)
+
+    # Extract the face
+    (x, y, w, h) = face['box']
+    face_img = aligned_image[y:y+h, x:x+w]
+    return cv2.resize(face_img, (size, size))
+
+def align_face_direct(image, face, size=160):
+    # Fold the rotation, the box crop and the resize into one affine transform and warp straight
+    # into the size x size output, so only output pixels are interpolated. The geometry matches
+    # align_face_legacy, which keeps embeddings comparable with templates enrolled through it.
+    M = face_rotation_matrix(face)
+    (x, y, w, h) = face['box']
+    scale = np.array([[size / w], [size / h]])
+
+    # cv2.resize maps pixel centres: dst = scale * (src + 0.5) - 0.5
+    direct = np.empty((2, 3))
+    direct[:, :2] = scale * M[:, :2]
+    direct[:, 2] = scale[:, 0] * (M[:, 2] - (x, y) + 0.5) - 0.5
+    return cv2.warpAffine(image, direct, (size, size), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
+
 class FaceRecognition:
     _instance = None
 
@@ -25,70 +73,146 @@ class FaceRecognition:
             raise Exception("This class is a singleton. Use get_instance() to get the object.")
         else:
             FaceRecognition._instance = self
-            self.graph = None
-            self.sess = None
-            self.images_placeholder = None
-            self.embeddings = None
-            self.phase_train_placeholder = None
-            self.face_detector = MTCNN(min_face_size=20, steps_threshold=[0.6, 0.7, 0.7])
+            self.backend = None
+            self.face_detector = MTCNN(min_face_size=Config.DETECTION_MIN_FACE_SIZE, steps_threshold=[0.6, 0.7, 0.7])
+            # Detectors for downscaled frames, keyed by minimum face size (see detector_for)
+            self._detectors = {Config.DETECTION_MIN_FACE_SIZE: self.face_detector}
+            self._detector_lock = threading.Lock()
+            self.last_detection_timings = None
+            # Set by warmup() once MTCNN and FaceNet have each run at least once
+            self.ready = threading.Event()
+            self.warmup_timings = None
+            # Concurrent callers share FaceNet batches; a window of 0 embeds every call directly
+            self.embedding_batcher = None
+            if Config.EMBEDDING_BATCH_WINDOW_MS > 0:
+                self.embedding_batcher = EmbeddingBatcher(
+                    self._embed_faces,
+                    window_ms=Config.EMBEDDING_BATCH_WINDOW_MS,
+                    max_batch=Config.EMBEDDING_BATCH_SIZE
+                )
             self.load_facenet_model()
 
     def load_facenet_model(self):
+        # The FaceNet runtime (TF session, ONNX Runtime, int8 ONNX) comes from Config.INFERENCE_BACKEND
         try:
-            self.graph = tf.Graph()
-            with self.graph.as_default():
-                with tf.io.gfile.GFile(Config.FACENET_MODEL_PATH, "rb") as f:
-                    graph_def = tf.compat.v1.GraphDef()
-                    graph_def.ParseFromString(f.read())
-                tf.import_graph_def(graph_def, name='')
-            
-            self.sess = tf.compat.v1.Session(graph=self.graph)
-            
-            self.images_placeholder = self.graph.get_tensor_by_name("input:0")
-            self.embeddings = self.graph.get_tensor_by_name("embeddings:0")
-            self.phase_train_placeholder = self.graph.get_tensor_by_name("phase_train:0")
-            
+            self.backend = create_backend()
             logger.info("FaceNet model loaded successfully")
             return True
         except Exception as e:
             logger.error(f"Error loading FaceNet model: {e}")
             return None
 
-    def detect_faces(self, frame):
+    def warmup(self, frames=None, frame_shape=(480, 640, 3)):
+        # The first MTCNN and FaceNet calls pay for graph initialisation and memory allocation,
+        # so run both on synthetic frames before serving. Per-pass timings show cold vs steady.
+        frames = Config.WARMUP_FRAMES if frames is None else frames
+        rng = np.random.default_rng(0)
+        start = time.perf_counter()
+        detect_ms = []
+        for _ in range(max(1, frames)):
+            frame = cv2.GaussianBlur(rng.integers(0, 256, frame_shape, dtype=np.uint8), (15, 15), 5)
+            t0 = time.perf_counter()
+            # Straight to the detector: a faceless synthetic frame must not reach the debug spool
+            self.face_detector.detect_faces(frame)
+            detect_ms.append((time.perf_counter() - t0) * 1000)
+        # Synthetic frames rarely get past P-Net, so call the refine and output stages directly
+        for stage, size in (('_rnet', 24), ('_onet', 48)):
+            net = getattr(self.face_detector, stage, None)
+            if net is not None:
+                net.predict(np.zeros((1, size, size, 3), dtype=np.float32))
+
+        embed_ms = []
+        face = rng.integers(0, 256, (160, 160, 3), dtype=np.uint8)
+        if self.backend is not None:
+            # A single face and a full batch, the two shapes seen in serving
+            for count in (1, Config.EMBEDDING_BATCH_SIZE, 1):
+                t0 = time.perf_counter()
+                self.get_face_embeddings_batch([face] * count)
+                embed_ms.append((time.perf_counter() - t0) * 1000)
+
+        self.warmup_timings = {
+            "detect_ms": detect_ms,
+            "embed_ms": embed_ms,
+            "total_ms": (time.perf_counter() - start) * 1000,
+        }
+        logger.info(f"Warmup finished in {self.warmup_timings['total_ms']:.0f}ms: {self.warmup_timings}")
+        if self.backend is not None:
+            self.ready.set()
+        else:
+            logger.error("FaceNet model is not loaded; staying not ready")
+        return self.warmup_timings
+
+    def detector_for(self, min_face_size):
+        # MTCNN keeps min_face_size as instance state, so rather than retuning one detector under
+        # concurrent callers (e.g. the registration thread pool) each size gets its own. Sizes only
+        # range from 12 to DETECTION_MIN_FACE_SIZE, so a handful of detectors at most are created.
+        detector = self._detectors.get(min_face_size)
+        if detector is None:
+            with self._detector_lock:
+                detector = self._detectors.get(min_face_size)
+                if detector is None:
+                    detector = MTCNN(min_face_size=min_face_size, steps_threshold=[0.6, 0.7, 0.7])
+                    self._detectors[min_face_size] = detector
+        return detector
+
+    def detect_faces(self, frame, max_side=None):
+        faces, _ = self.detect_faces_timed(frame, max_side=max_side)
+        return faces
+
+    def detect_faces_timed(self, frame, max_side=None):
+        # Runs MTCNN on a copy whose longest side is at most max_side (0 disables downscaling)
+        # and maps boxes and keypoints back to full resolution. Returns (faces, timings in ms).
         logger.info(f"Detecting faces in frame of shape {frame.shape}")
-        faces = self.face_detector.detect_faces(frame)
-        logger.info(f"Detected {len(faces)} faces")
+        start = time.perf_counter()
+        max_side = Config.DETECTION_MAX_SIDE if max_side is None else max_side
+        scale = 1.0
+        if max_side and max(frame.shape[:2]) > max_side:
+            scale = max_side / max(frame.shape[:2])
+        small = frame
+        if scale < 1.0:
+            small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        resized = time.perf_counter()
+
+        # Keep the same minimum face size in full-resolution pixels; MTCNN cannot go below 12
+        min_face_size = max(12, int(round(Config.DETECTION_MIN_FACE_SIZE * scale)))
+        faces = self.detector_for(min_face_size).detect_faces(small)
+        detected = time.perf_counter()
+
+        if scale < 1.0:
+            faces = [self._rescale_face(face, 1.0 / scale) for face in faces]
+
+        timings = {
+            "scale": scale,
+            "resize_ms": (resized - start) * 1000,
+            "detect_ms": (detected - resized) * 1000,
+            "total_ms": (time.perf_counter() - start) * 1000,
+        }
+        self.last_detection_timings = timings
+        logger.info(f"Detected {len(faces)} faces in {timings['total_ms']:.1f}ms (scale {scale:.3f})")
         if len(faces) == 0:
-            logger.warning("No faces detected. Saving debug image.")
-            cv2.imwrite('debug_no_faces.jpg', frame)
-        return faces
+            logger.warning("No faces detected. Offering frame to the debug capture spool.")
+            get_debug_capture().capture(frame, 'no_faces')
+        return faces, timings
 
-    def align_face(self, image, face):
-        logger.debug(f"Aligning face: {face}")
-        bounding_box = face['box']
-        keypoints = face['keypoints']
-        
-        left_eye = keypoints['left_eye']
-        right_eye = keypoints['right_eye']
-        
-        # Calculate angle
-        dY = right_eye[1] - left_eye[1]
-        dX = right_eye[0] - left_eye[0]
-        angle = np.degrees(np.arctan2(dY, dX)) - 180
+    def _rescale_face(self, face, factor):
+        x, y, w, h = face['box']
+        face = dict(face)
+        face['box'] = [int(round(x * factor)), int(round(y * factor)), int(round(w * factor)), int(round(h * factor))]
+        face['keypoints'] = {
+            name: (int(round(px * factor)), int(round(py * factor)))
+            for name, (px, py) in face['keypoints'].items()
+        }
+        return face
 
-        # Get the center of the face
-        center = (bounding_box[0] + bounding_box[2]//2, bounding_box[1] + bounding_box[3]//2)
-        
-        # Rotate the image
-        M = cv2.getRotationMatrix2D(center, angle, 1)
-        aligned_image = cv2.warpAffine(image, M, (image.shape[1], image.shape[0]), flags=cv2.INTER_CUBIC)
-        
-        # Extract the face
-        (x, y, w, h) = bounding_box
-        face_img = aligned_image[y:y+h, x:x+w]
+    def align_face(self, image, face, mode=None):
+        logger.debug(f"Aligning face: {face}")
+        mode = mode or Config.ALIGNMENT_MODE
+        if mode == 'legacy':
+            face_img = align_face_legacy(image, face)
+        else:
+            face_img = align_face_direct(image, face)
         logger.debug(f"Aligned face shape: {face_img.shape}")
-        
-        return cv2.resize(face_img, (160, 160))
+        return face_img
 
     def preprocess_face(self, face_image):
         face_image = face_image.astype(np.float32) / 255.0
@@ -96,23 +220,44 @@ class FaceRecognition:
 
     def get_face_embedding(self, face_image):
         logger.debug(f"Getting face embedding for image of shape {face_image.shape}")
+        face_embeddings = self.get_face_embeddings_batch([face_image])
+        if face_embeddings is None:
+            return None
+        face_embedding = face_embeddings[0]
+        logger.debug(f"Face embedding shape: {face_embedding.shape}")
+        return face_embedding
+
+    def get_face_embeddings_batch(self, faces, batch_size=None):
+        # Embed N aligned 160x160 crops. With the micro-batcher enabled the crops join the batch
+        # being collected from other threads; an explicit batch_size bypasses it.
+        logger.debug(f"Getting face embeddings for a batch of {len(faces)} images")
+        if self.backend is None:
+            logger.error("Inference backend is not initialized")
+            return None
+        if len(faces) == 0:
+            return np.empty((0, self.backend.dim), dtype=np.float32)
+        if self.embedding_batcher is not None and batch_size is None:
+            return self.embedding_batcher.embed(list(faces))
+        return self._embed_faces(faces, batch_size)
+
+    def _embed_faces(self, faces, batch_size=None):
+        # One backend call per chunk of at most batch_size faces
         try:
-            if self.sess is None:
-                logger.error("TensorFlow session is not initialized")
-                return None
-            preprocessed_image = self.preprocess_face(face_image)
-            logger.debug(f"Preprocessed image shape: {preprocessed_image.shape}")
-            feed_dict = {
-                self.images_placeholder: [preprocessed_image],
-                self.phase_train_placeholder: False
-            }
-            face_embedding = self.sess.run(self.embeddings, feed_dict=feed_dict)[0]
-            logger.debug(f"Face embedding shape: {face_embedding.shape}")
-            return face_embedding
+            batch_size = batch_size or Config.EMBEDDING_BATCH_SIZE
+            face_embeddings = []
+            for start in range(0, len(faces), batch_size):
+                batch = self.preprocess_face(np.stack(faces[start:start + batch_size]))
+                face_embeddings.append(self.backend.embed(batch))
+            face_embeddings = np.concatenate(face_embeddings)
+            logger.debug(f"Face embeddings shape: {face_embeddings.shape}")
+            return face_embeddings
         except Exception as e:
-            logger.error(f"Error getting face embedding: {e}")
+            logger.error(f"Error getting face embeddings: {e}")
             return None
 
+    def embedding_batcher_stats(self):
+        return self.embedding_batcher.stats() if self.embedding_batcher is not None else None
+
     def compare_faces(self, face_embedding1, face_embedding2):
         try:
             # Ensure both embeddings are 1-D numpy arrays
@@ -132,35 +277,17 @@ class FaceRecognition:
             return float('inf')
 
     def is_valid_face(self, face_image):
-        if face_image.shape[0] < 50 or face_image.shape[1] < 50:
-            return False
-        
-        # Check for blur
-        gray = cv2.cvtColor(face_image, cv2.COLOR_BGR2GRAY)
-        blur_value = cv2.Laplacian(gray, cv2.CV_64F).var()
-        if blur_value < 100:  # Adjust this threshold as needed
-            return False
-        
-        # Check for extreme lighting conditions
-        if np.mean(gray) < 50 or np.mean(gray) > 200:
-            return False
-        
-        return True
+        # face_image is a face crop: size, blur and lighting, without the pose check
+        return score_face(face_image, min_size=50, max_yaw=float('inf'), max_roll=float('inf')).ok
 
-    def get_multiple_embeddings(self, face_image, num_augmentations=5):
-        embeddings = []
-        
-        # Original image
-        embeddings.append(self.get_face_embedding(face_image))
-        
-        # Augmented images
-        for _ in range(num_augmentations - 1):
-            augmented_image = self.augment_image(face_image)
-            embedding = self.get_face_embedding(augmented_image)
-            if embedding is not None:
-                embeddings.append(embedding)
-        
-        return embeddings
+    def get_multiple_embeddings(self, face_image, num_augmentations=5, seed=None):
+        # Original image followed by the augmented copies, built as one array and embedded in one batch
+        images = FaceAugmenter(seed=seed).augment_batch(face_image, num_augmentations - 1, include_original=True)
+
+        embeddings = self.get_face_embeddings_batch(images)
+        if embeddings is None:
+            return []
+        return list(embeddings)
 
     def augment_image(self, image):
         # Apply random augmentations
@@ -183,35 +310,40 @@ class FaceRecognition:
         return augmented
 
     def check_face_quality(self, face_image, min_size=100, blur_threshold=100):
-        if face_image.shape[0] < min_size or face_image.shape[1] < min_size:
-            return False
-        
-        gray = cv2.cvtColor(face_image, cv2.COLOR_BGR2GRAY)
-        blur_value = cv2.Laplacian(gray, cv2.CV_64F).var()
-        if blur_value < blur_threshold:
-            return False
-        
-        return True
+        # Size and blur only, as used on aligned crops
+        score = score_face(face_image, min_size=min_size, blur_threshold=blur_threshold,
+                           brightness_range=(0, 255), max_yaw=float('inf'), max_roll=float('inf'))
+        return score.ok
+
+    def _detect_quality_face(self, face_image):
+        # First detected face if the frame and the face pass the quality gate, otherwise None
+        if not score_frame(face_image).ok:
+            return None
+        faces = self.detect_faces(face_image)
+        if not faces or not score_face(face_image, faces[0]).ok:
+            return None
+        return faces[0]
 
     def recognize_face(self, input_embedding, stored_embeddings, threshold=0.5):  # Adjusted threshold: a lower value means more strict recognition and vice versa
-        if not stored_embeddings:
+        if stored_embeddings is None or len(stored_embeddings) == 0:
             return False, float('inf')
-        
-        distances = [self.compare_faces(input_embedding, emb) for emb in stored_embeddings]
-        min_distance = min(distances)
-        
+
+        # One matrix-vector product over all templates instead of a scipy call per pair
+        try:
+            min_distance = float(cosine_distances(input_embedding, stored_embeddings).min())
+        except Exception as e:
+            logger.error(f"Error in recognize_face: {str(e)}")
+            return False, float('inf')
+
         logger.info(f"Face recognition distance: {min_distance}, threshold: {threshold}")
         return min_distance < threshold, min_distance
     
     def register_face(self, face_image):
-        if not self.is_valid_face(face_image):
-            return None
-        
-        faces = self.detect_faces(face_image)
-        if not faces:
+        face = self._detect_quality_face(face_image)
+        if face is None:
             return None
         
-        aligned_face = self.align_face(face_image, faces[0])
+        aligned_face = self.align_face(face_image, face)
         embeddings = self.get_multiple_embeddings(aligned_face, num_augmentations=10)
         return embeddings
     
@@ -221,14 +353,11 @@ class FaceRecognition:
         return np.mean(embeddings, axis=0)
 
     def verify_face(self, face_image, stored_embeddings):
-        if not self.is_valid_face(face_image):
-            return False
-        
-        faces = self.detect_faces(face_image)
-        if not faces:
+        face = self._detect_quality_face(face_image)
+        if face is None:
             return False
         
-        aligned_face = self.align_face(face_image, faces[0])
+        aligned_face = self.align_face(face_image, face)
         input_embedding = self.get_face_embedding(aligned_face)
         
         return self.recognize_face(input_embedding, stored_embeddings)
\ No newline at end of file
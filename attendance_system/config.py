@@ -9,4 +9,67 @@ class Config:
     MYSQL_USER = os.getenv('MYSQL_USER')
     MYSQL_PASSWORD = os.getenv('MYSQL_PASSWORD')
     MYSQL_DB = os.getenv('MYSQL_DB')
-    FACENET_MODEL_PATH = os.getenv('FACENET_MODEL_PATH')
\ No newline at end of file
+    FACENET_MODEL_PATH = os.getenv('FACENET_MODEL_PATH')
+    EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 32))
+    EMBEDDING_BATCH_WINDOW_MS = float(os.getenv('EMBEDDING_BATCH_WINDOW_MS', 5))  # 0 disables micro-batching
+    EMBEDDING_STORAGE_DTYPE = os.getenv('EMBEDDING_STORAGE_DTYPE', 'float32')  # 'float32' or 'float16'
+    EMBEDDING_MODEL_VERSION = int(os.getenv('EMBEDDING_MODEL_VERSION', 1))
+    RECOGNITION_THRESHOLD = float(os.getenv('RECOGNITION_THRESHOLD', 0.5))
+    GALLERY_POLL_INTERVAL = float(os.getenv('GALLERY_POLL_INTERVAL', 0))
+    GALLERY_INDEX = os.getenv('GALLERY_INDEX', 'flat')  # 'flat', 'exact' or 'ivf'
+    GALLERY_INDEX_NLIST = int(os.getenv('GALLERY_INDEX_NLIST', 256))
+    GALLERY_INDEX_NPROBE = int(os.getenv('GALLERY_INDEX_NPROBE', 8))
+    GALLERY_INDEX_CANDIDATES = int(os.getenv('GALLERY_INDEX_CANDIDATES', 64))
+    GALLERY_CENTROID_CANDIDATES = int(os.getenv('GALLERY_CENTROID_CANDIDATES', 0))  # opt-in shortlist size; 0 rescores every student
+    GALLERY_CENTROID_FALLBACK = os.getenv('GALLERY_CENTROID_FALLBACK', 'true').lower() in ('1', 'true', 'yes')
+    GALLERY_TIMETABLE_SCOPE = os.getenv('GALLERY_TIMETABLE_SCOPE', 'false').lower() in ('1', 'true', 'yes')
+    GALLERY_CHANGE_WINDOW = int(os.getenv('GALLERY_CHANGE_WINDOW', 1000))  # skipped change ids tracked for late commits
+    GALLERY_GAP_TIMEOUT = float(os.getenv('GALLERY_GAP_TIMEOUT', 60))  # seconds a skipped change id is still asked for
+    GALLERY_SCOPE_CACHE_SIZE = int(os.getenv('GALLERY_SCOPE_CACHE_SIZE', 8))  # cached per-slot sub-galleries
+    TIMETABLE_SCOPE_LEAD_MINUTES = int(os.getenv('TIMETABLE_SCOPE_LEAD_MINUTES', 30))
+    TIMETABLE_SCOPE_TTL = float(os.getenv('TIMETABLE_SCOPE_TTL', 300))  # seconds before the day's slots are re-read
+    ALIGNMENT_MODE = os.getenv('ALIGNMENT_MODE', 'direct')  # 'direct' or 'legacy'
+    DETECTION_MAX_SIDE = int(os.getenv('DETECTION_MAX_SIDE', 0))  # 0 runs MTCNN at full resolution
+    UPLOAD_DECODE_MAX_SIDE = int(os.getenv('UPLOAD_DECODE_MAX_SIDE', 0))  # 0 always decodes binary uploads at full size
+    DETECTION_MIN_FACE_SIZE = int(os.getenv('DETECTION_MIN_FACE_SIZE', 20))
+    DEBUG_CAPTURE_DIR = os.getenv('DEBUG_CAPTURE_DIR', 'debug_captures')
+    DEBUG_CAPTURE_SAMPLE_RATE = float(os.getenv('DEBUG_CAPTURE_SAMPLE_RATE', 0.1))
+    DEBUG_CAPTURE_QUEUE_SIZE = int(os.getenv('DEBUG_CAPTURE_QUEUE_SIZE', 8))
+    DEBUG_CAPTURE_MAX_MB = int(os.getenv('DEBUG_CAPTURE_MAX_MB', 100))
+    REGISTRATION_WORKERS = int(os.getenv('REGISTRATION_WORKERS', 4))
+    INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'tf')  # 'tf', 'onnx' or 'onnx-int8'
+    ONNX_MODEL_PATH = os.getenv('ONNX_MODEL_PATH', 'models/facenet.onnx')
+    ONNX_INT8_MODEL_PATH = os.getenv('ONNX_INT8_MODEL_PATH', 'models/facenet.int8.onnx')
+    TF_INTRA_OP_THREADS = int(os.getenv('TF_INTRA_OP_THREADS', 0))  # 0 lets the runtime pick
+    TF_INTER_OP_THREADS = int(os.getenv('TF_INTER_OP_THREADS', 0))
+    LOAD_FACE_RECOGNITION = os.getenv('LOAD_FACE_RECOGNITION', 'true').lower() in ('1', 'true', 'yes')
+    WARMUP_ON_STARTUP = os.getenv('WARMUP_ON_STARTUP', 'true').lower() in ('1', 'true', 'yes')
+    WARMUP_FRAMES = int(os.getenv('WARMUP_FRAMES', 2))
+    USE_INFERENCE_SERVER = os.getenv('USE_INFERENCE_SERVER', 'false').lower() in ('1', 'true', 'yes')
+    # The socket lives in its own 0o750 directory; requests are pickled, so both sides must share the secret authkey
+    INFERENCE_SOCKET_PATH = os.getenv('INFERENCE_SOCKET_PATH', '/tmp/attendance_inference/inference.sock')
+    INFERENCE_AUTHKEY = os.getenv('INFERENCE_AUTHKEY')
+    TRACK_IOU_THRESHOLD = float(os.getenv('TRACK_IOU_THRESHOLD', 0.3))
+    TRACK_MAX_MISSED = int(os.getenv('TRACK_MAX_MISSED', 10))
+    TRACK_REVERIFY_FRAMES = int(os.getenv('TRACK_REVERIFY_FRAMES', 30))
+    TRACK_MIN_CONFIDENCE = float(os.getenv('TRACK_MIN_CONFIDENCE', 0.95))
+    PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', 1))  # 1 hands each stage only the newest frame
+    PIPELINE_REPORT_INTERVAL = float(os.getenv('PIPELINE_REPORT_INTERVAL', 5))  # seconds between stage stats
+    FRAME_CACHE_SIZE = int(os.getenv('FRAME_CACHE_SIZE', 64))  # 0 disables the retry cache
+    FRAME_CACHE_TTL = float(os.getenv('FRAME_CACHE_TTL', 3))  # seconds
+    FRAME_CACHE_HASH_SIZE = int(os.getenv('FRAME_CACHE_HASH_SIZE', 16))  # dHash of hash_size**2 bits
+    FRAME_CACHE_MAX_DISTANCE = int(os.getenv('FRAME_CACHE_MAX_DISTANCE', 8))  # differing bits still a retry
+    STREAM_STABLE_FRAMES = int(os.getenv('STREAM_STABLE_FRAMES', 5))  # still, good-quality frames before matching
+    STREAM_STABLE_IOU = float(os.getenv('STREAM_STABLE_IOU', 0.6))  # box overlap with the previous frame to count as still
+    # Face quality gate (face_quality.py); blur is Laplacian variance on a 160px analysis copy
+    QUALITY_MIN_FACE_SIZE = int(os.getenv('QUALITY_MIN_FACE_SIZE', 50))
+    QUALITY_BLUR_THRESHOLD = float(os.getenv('QUALITY_BLUR_THRESHOLD', 100))
+    QUALITY_MIN_BRIGHTNESS = float(os.getenv('QUALITY_MIN_BRIGHTNESS', 50))
+    QUALITY_MAX_BRIGHTNESS = float(os.getenv('QUALITY_MAX_BRIGHTNESS', 200))
+    QUALITY_MAX_YAW = float(os.getenv('QUALITY_MAX_YAW', 0.45))  # nose offset in eye distances
+    QUALITY_MAX_ROLL = float(os.getenv('QUALITY_MAX_ROLL', 35))  # degrees
+    # Whole-frame rejection before MTCNN; loose enough to only catch hopeless frames
+    FRAME_MIN_BRIGHTNESS = float(os.getenv('FRAME_MIN_BRIGHTNESS', 25))
+    FRAME_MAX_BRIGHTNESS = float(os.getenv('FRAME_MAX_BRIGHTNESS', 235))
+    FRAME_MIN_CONTRAST = float(os.getenv('FRAME_MIN_CONTRAST', 8))
+    FRAME_BLUR_THRESHOLD = float(os.getenv('FRAME_BLUR_THRESHOLD', 15))
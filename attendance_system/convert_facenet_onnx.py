@@ -0,0 +1,58 @@
+# Converts the frozen FaceNet graph at Config.FACENET_MODEL_PATH to ONNX for the ONNX Runtime
+# backend, and optionally writes a dynamically int8-quantized copy.
+#
+#   pip install tf2onnx onnxruntime
+#   python convert_facenet_onnx.py --int8
+#
+# phase_train is folded to a constant False before conversion, so the ONNX model has a single
+# float32 input of shape (N, 160, 160, 3) and a single embeddings output.
+import argparse
+import logging
+import tensorflow as tf
+from config import Config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def inference_graph_def(model_path):
+    with tf.io.gfile.GFile(model_path, "rb") as f:
+        graph_def = tf.compat.v1.GraphDef()
+        graph_def.ParseFromString(f.read())
+
+    graph = tf.Graph()
+    with graph.as_default():
+        tf.import_graph_def(graph_def, input_map={"phase_train:0": tf.constant(False)}, name='')
+    return tf.compat.v1.graph_util.extract_sub_graph(graph.as_graph_def(), ["embeddings"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default=Config.FACENET_MODEL_PATH)
+    parser.add_argument('--output', default=Config.ONNX_MODEL_PATH)
+    parser.add_argument('--int8', action='store_true', help="also write a dynamic int8-quantized model")
+    parser.add_argument('--int8-output', default=Config.ONNX_INT8_MODEL_PATH)
+    parser.add_argument('--opset', type=int, default=13)
+    args = parser.parse_args()
+
+    import tf2onnx
+
+    graph_def = inference_graph_def(args.model)
+    tf2onnx.convert.from_graph_def(
+        graph_def,
+        input_names=["input:0"],
+        output_names=["embeddings:0"],
+        opset=args.opset,
+        output_path=args.output
+    )
+    logger.info(f"Wrote ONNX model to {args.output}")
+
+    if args.int8:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        quantize_dynamic(args.output, args.int8_output, weight_type=QuantType.QInt8)
+        logger.info(f"Wrote int8-quantized ONNX model to {args.int8_output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+import os
+import queue
+import random
+import threading
+import time
+import logging
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class DebugCapture:
+    # Samples frames that failed recognition and writes them as JPEGs from a background thread.
+    #
+    # The request thread only pays for the sampling decision and a frame copy: frames go through a
+    # bounded queue that drops new captures when full, and the writer keeps the directory under
+    # max_bytes by deleting the oldest captures first.
+
+    def __init__(self, directory, sample_rate=1.0, queue_size=8, max_bytes=100 * 1024 * 1024, jpeg_quality=85):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.jpeg_quality = jpeg_quality
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._files = []
+        self._bytes_on_disk = 0
+        self._sequence = 0
+        self.counts = {
+            "offered": 0,
+            "sampled_out": 0,
+            "dropped": 0,
+            "written": 0,
+            "evicted": 0,
+            "errors": 0,
+        }
+
+    def capture(self, frame, reason):
+        with self._lock:
+            self.counts["offered"] += 1
+            if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+                self.counts["sampled_out"] += 1
+                return False
+            self._sequence += 1
+            sequence = self._sequence
+            self._ensure_writer()
+
+        try:
+            # Copy so callers can keep drawing on the frame while it waits in the queue
+            self._queue.put_nowait((reason, sequence, frame.copy()))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.counts["dropped"] += 1
+            return False
+
+    def _ensure_writer(self):
+        if self._thread is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._scan_existing()
+            self._thread = threading.Thread(target=self._write_loop, name="debug-capture", daemon=True)
+            self._thread.start()
+
+    def _scan_existing(self):
+        # Captures left by previous runs count against the budget, oldest first
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith('.jpg') and os.path.isfile(path):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, path, stat.st_size))
+        files.sort()
+        self._files = [(path, size) for _, path, size in files]
+        self._bytes_on_disk = sum(size for _, size in self._files)
+
+    def _write_loop(self):
+        import cv2
+
+        while True:
+            reason, sequence, frame = self._queue.get()
+            try:
+                path = os.path.join(self.directory, f"{reason}_{int(time.time() * 1000)}_{sequence}.jpg")
+                if not cv2.imwrite(path, frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]):
+                    raise IOError(f"cv2.imwrite failed for {path}")
+                size = os.path.getsize(path)
+                with self._lock:
+                    self._files.append((path, size))
+                    self._bytes_on_disk += size
+                    self.counts["written"] += 1
+                self._evict()
+            except Exception as e:
+                logger.error(f"Error writing debug capture: {str(e)}")
+                with self._lock:
+                    self.counts["errors"] += 1
+            finally:
+                self._queue.task_done()
+
+    def _evict(self):
+        while True:
+            with self._lock:
+                if self._bytes_on_disk <= self.max_bytes or not self._files:
+                    return
+                path, size = self._files.pop(0)
+                self._bytes_on_disk -= size
+                self.counts["evicted"] += 1
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not evict debug capture {path}: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counts)
+            stats["queued"] = self._queue.qsize()
+            stats["files_on_disk"] = len(self._files)
+            stats["bytes_on_disk"] = self._bytes_on_disk
+            return stats
+
+
+_debug_capture = None
+_debug_capture_lock = threading.Lock()
+
+def get_debug_capture():
+    global _debug_capture
+    with _debug_capture_lock:
+        if _debug_capture is None:
+            _debug_capture = DebugCapture(
+                Config.DEBUG_CAPTURE_DIR,
+                sample_rate=Config.DEBUG_CAPTURE_SAMPLE_RATE,
+                queue_size=Config.DEBUG_CAPTURE_QUEUE_SIZE,
+                max_bytes=Config.DEBUG_CAPTURE_MAX_MB * 1024 * 1024
+            )
+        return _debug_capture
@@ -0,0 +1,132 @@
+import threading
+import queue
+import time
+import logging
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the batch size histogram buckets, in faces; larger batches land in the last one
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class EmbeddingBatcher:
+    # Coalesces embedding requests from concurrent callers into one FaceNet batch.
+    #
+    # The worker thread takes the first waiting request, then keeps collecting for at most
+    # window_ms or until max_batch faces are queued, runs embed_fn once on all of them and
+    # resolves every caller's future with its own rows. A request bigger than max_batch runs
+    # on its own, and embed_fn chunks it as usual.
+
+    def __init__(self, embed_fn, window_ms=5.0, max_batch=32):
+        self.embed_fn = embed_fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        # A request taken off the queue that did not fit the previous batch; it opens the next one
+        self._carry = None
+        self._lock = threading.Lock()
+        self._worker = None
+        self.batches = 0
+        self.requests = 0
+        self.faces = 0
+        self.max_queue_depth = 0
+        self.histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self.histogram['more'] = 0
+        self._waits_ms = deque(maxlen=1024)
+        self._total_wait_ms = 0.0
+
+    def submit(self, faces):
+        # faces is a list of aligned crops; the future resolves to their (N, dim) embeddings,
+        # or None if embed_fn failed
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((time.perf_counter(), faces, future))
+        depth = self._queue.qsize()
+        with self._lock:
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+        return future
+
+    def embed(self, faces):
+        return self.submit(faces).result()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        if self._carry is not None:
+            pending, self._carry = [self._carry], None
+        else:
+            pending = [self._queue.get()]
+        count = len(pending[0][1])
+        deadline = time.perf_counter() + self.window
+        while count < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if count + len(item[1]) > self.max_batch:
+                self._carry = item
+                break
+            pending.append(item)
+            count += len(item[1])
+        return pending, count
+
+    def _run(self):
+        while True:
+            pending, count = self._collect()
+            started = time.perf_counter()
+            faces = [face for _, request_faces, _ in pending for face in request_faces]
+            try:
+                embeddings = self.embed_fn(faces)
+            except Exception as e:
+                logger.error(f"Batched embedding of {count} faces failed: {e}")
+                embeddings = None
+
+            offset = 0
+            for _, request_faces, future in pending:
+                if embeddings is None:
+                    future.set_result(None)
+                else:
+                    future.set_result(embeddings[offset:offset + len(request_faces)])
+                offset += len(request_faces)
+            self._record(pending, count, started)
+
+    def _record(self, pending, count, started):
+        with self._lock:
+            self.batches += 1
+            self.requests += len(pending)
+            self.faces += count
+            bucket = next((bucket for bucket in BATCH_SIZE_BUCKETS if count <= bucket), 'more')
+            self.histogram[bucket] += 1
+            for submitted, _, _ in pending:
+                wait_ms = (started - submitted) * 1000
+                self._waits_ms.append(wait_ms)
+                self._total_wait_ms += wait_ms
+
+    def stats(self):
+        with self._lock:
+            waits = np.array(self._waits_ms) if self._waits_ms else np.zeros(1)
+            return {
+                "window_ms": self.window * 1000,
+                "max_batch": self.max_batch,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "batches": self.batches,
+                "requests": self.requests,
+                "faces": self.faces,
+                "mean_batch_size": self.faces / self.batches if self.batches else 0.0,
+                "batch_size_histogram": {str(bucket): count for bucket, count in self.histogram.items()},
+                "mean_wait_ms": self._total_wait_ms / self.requests if self.requests else 0.0,
+                # Over the most recent 1024 requests
+                "p95_wait_ms": float(np.percentile(waits, 95)),
+                "max_wait_ms": float(waits.max()),
+            }
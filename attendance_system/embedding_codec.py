@@ -0,0 +1,66 @@
+import struct
+from collections import namedtuple
+import numpy as np
+from config import Config
+
+# Binary face template format stored in Student.face_embeddings:
+#
+#   magic   4s  b'FEMB'
+#   version B   format version (1)
+#   dtype   B   0 = little-endian float32, 1 = little-endian float16
+#   dim     H   embedding dimension
+#   count   I   number of templates
+#   model   H   EMBEDDING_MODEL_VERSION of the model that produced them
+#   2 bytes of padding, then count * dim packed values, row-major
+#
+# The 16-byte header keeps the payload aligned, so decoding is a np.frombuffer view of the blob.
+MAGIC = b'FEMB'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sBBHIH2x')
+DTYPES = {0: np.dtype('<f4'), 1: np.dtype('<f2')}
+DTYPE_CODES = {'float32': 0, 'float16': 1}
+
+EmbeddingHeader = namedtuple('EmbeddingHeader', ['version', 'dtype', 'dim', 'count', 'model_version'])
+
+
+def encode_embeddings(embeddings, dtype=None, model_version=None):
+    dtype = dtype or Config.EMBEDDING_STORAGE_DTYPE
+    model_version = Config.EMBEDDING_MODEL_VERSION if model_version is None else model_version
+    if dtype not in DTYPE_CODES:
+        raise ValueError(f"Unsupported embedding storage dtype: {dtype}")
+    code = DTYPE_CODES[dtype]
+    block = np.asarray(embeddings, dtype=DTYPES[code])
+    if block.ndim == 1:
+        block = block[None, :]
+    if block.ndim != 2:
+        raise ValueError(f"Expected (count, dim) embeddings, got shape {block.shape}")
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, code, block.shape[1], block.shape[0], model_version)
+    return header + np.ascontiguousarray(block).tobytes()
+
+
+def read_header(blob):
+    if len(blob) < HEADER.size:
+        raise ValueError("Embedding blob is shorter than its header")
+    magic, version, code, dim, count, model_version = HEADER.unpack_from(blob)
+    if magic != MAGIC:
+        raise ValueError("Not an embedding blob")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported embedding format version {version}")
+    if code not in DTYPES:
+        raise ValueError(f"Unknown embedding dtype code {code}")
+    return EmbeddingHeader(version, DTYPES[code], dim, count, model_version)
+
+
+def decode_embeddings(blob, model_version=None):
+    # (count, dim) read-only view over the blob; float16 blobs stay float16 until normalized.
+    # Templates from another model are not comparable with current embeddings, so a blob whose
+    # model version differs from model_version (default EMBEDDING_MODEL_VERSION) is rejected.
+    header = read_header(blob)
+    model_version = Config.EMBEDDING_MODEL_VERSION if model_version is None else model_version
+    if header.model_version != model_version:
+        raise ValueError(f"Embeddings are from model version {header.model_version}, expected {model_version}")
+    expected = HEADER.size + header.count * header.dim * header.dtype.itemsize
+    if len(blob) != expected:
+        raise ValueError(f"Embedding blob is {len(blob)} bytes, expected {expected}")
+    return np.frombuffer(blob, dtype=header.dtype, count=header.count * header.dim,
+                         offset=HEADER.size).reshape(header.count, header.dim)
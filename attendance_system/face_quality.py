@@ -0,0 +1,129 @@
+import math
+from collections import namedtuple
+import cv2
+from config import Config
+
+# Every metric comes from one grayscale pass over a small copy of the region: the face box
+# resized to ANALYSIS_SIZE square (the size FaceNet sees, so blur values match the old checks
+# on aligned crops) or the whole frame with its longest side at ANALYSIS_SIZE.
+ANALYSIS_SIZE = 160
+
+QualityScore = namedtuple('QualityScore', ['ok', 'reason', 'size', 'blur', 'brightness', 'contrast', 'yaw', 'roll'])
+
+# Reason codes a kiosk can act on, with the message shown to the student
+REASON_MESSAGES = {
+    'ok': "OK",
+    'frame_too_dark': "The camera image is too dark. Please improve the lighting.",
+    'frame_too_bright': "The camera image is overexposed. Please avoid strong backlight.",
+    'frame_low_contrast': "The camera image is blank. Please check that the camera is not covered.",
+    'frame_too_blurry': "The camera image is out of focus. Please hold still.",
+    'face_too_small': "Please move closer to the camera.",
+    'face_too_blurry': "Poor quality image. Please try again with better lighting and less blur.",
+    'face_too_dark': "Your face is too dark. Please face the light.",
+    'face_too_bright': "Your face is overexposed. Please avoid strong light on your face.",
+    'face_pose': "Please look straight at the camera.",
+}
+
+
+def _analysis_gray(image, box=None):
+    if box is not None:
+        x, y, w, h = (int(v) for v in box)
+        x, y = max(x, 0), max(y, 0)
+        image = image[y:y + h, x:x + w]
+        size = (ANALYSIS_SIZE, ANALYSIS_SIZE)
+    else:
+        scale = ANALYSIS_SIZE / max(image.shape[:2])
+        size = (max(1, round(image.shape[1] * scale)), max(1, round(image.shape[0] * scale)))
+    if image.size == 0:
+        return None
+    # Downscale before the colour conversion so every later step touches ANALYSIS_SIZE pixels
+    small = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+
+def _measure(gray):
+    mean, std = cv2.meanStdDev(gray)
+    _, laplacian_std = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_64F))
+    return float(laplacian_std[0, 0] ** 2), float(mean[0, 0]), float(std[0, 0])
+
+
+def face_pose(face):
+    # (yaw, roll) from MTCNN keypoints: yaw is the nose's horizontal offset from the eye midpoint
+    # in eye distances (0 when frontal, about 0.5 at 45 degrees), roll the eye-line angle
+    keypoints = face.get('keypoints') if face else None
+    if not keypoints or not {'left_eye', 'right_eye', 'nose'} <= keypoints.keys():
+        return None, None
+    (lx, ly), (rx, ry), (nx, _) = keypoints['left_eye'], keypoints['right_eye'], keypoints['nose']
+    eye_distance = math.hypot(rx - lx, ry - ly)
+    if eye_distance == 0:
+        return None, None
+    yaw = (nx - (lx + rx) / 2) / eye_distance
+    roll = math.degrees(math.atan2(ry - ly, rx - lx))
+    return yaw, roll
+
+
+def score_frame(frame, min_brightness=None, max_brightness=None, min_contrast=None, blur_threshold=None):
+    # Cheap whole-frame check run before MTCNN; thresholds only catch hopeless frames
+    min_brightness = Config.FRAME_MIN_BRIGHTNESS if min_brightness is None else min_brightness
+    max_brightness = Config.FRAME_MAX_BRIGHTNESS if max_brightness is None else max_brightness
+    min_contrast = Config.FRAME_MIN_CONTRAST if min_contrast is None else min_contrast
+    blur_threshold = Config.FRAME_BLUR_THRESHOLD if blur_threshold is None else blur_threshold
+
+    gray = _analysis_gray(frame)
+    if gray is None:
+        return QualityScore(False, 'frame_low_contrast', 0, 0.0, 0.0, 0.0, None, None)
+    blur, brightness, contrast = _measure(gray)
+    if brightness < min_brightness:
+        reason = 'frame_too_dark'
+    elif brightness > max_brightness:
+        reason = 'frame_too_bright'
+    elif contrast < min_contrast:
+        reason = 'frame_low_contrast'
+    elif blur < blur_threshold:
+        reason = 'frame_too_blurry'
+    else:
+        reason = 'ok'
+    return QualityScore(reason == 'ok', reason, min(frame.shape[:2]), blur, brightness, contrast, None, None)
+
+
+def score_face(image, face=None, min_size=None, blur_threshold=None, brightness_range=None, max_yaw=None,
+               max_roll=None):
+    # Quality of one face, run before alignment and FaceNet. With face (an MTCNN detection) the
+    # box is scored and keypoints give the pose; without it the whole image is taken as the face.
+    min_size = Config.QUALITY_MIN_FACE_SIZE if min_size is None else min_size
+    blur_threshold = Config.QUALITY_BLUR_THRESHOLD if blur_threshold is None else blur_threshold
+    if brightness_range is None:
+        brightness_range = (Config.QUALITY_MIN_BRIGHTNESS, Config.QUALITY_MAX_BRIGHTNESS)
+    max_yaw = Config.QUALITY_MAX_YAW if max_yaw is None else max_yaw
+    max_roll = Config.QUALITY_MAX_ROLL if max_roll is None else max_roll
+
+    box = face['box'] if face else None
+    size = min(box[2], box[3]) if box is not None else min(image.shape[:2])
+    yaw, roll = face_pose(face)
+    if size < min_size:
+        return QualityScore(False, 'face_too_small', size, 0.0, 0.0, 0.0, yaw, roll)
+
+    gray = _analysis_gray(image, box)
+    if gray is None:
+        return QualityScore(False, 'face_too_small', 0, 0.0, 0.0, 0.0, yaw, roll)
+    blur, brightness, contrast = _measure(gray)
+    if blur < blur_threshold:
+        reason = 'face_too_blurry'
+    elif brightness < brightness_range[0]:
+        reason = 'face_too_dark'
+    elif brightness > brightness_range[1]:
+        reason = 'face_too_bright'
+    elif yaw is not None and (abs(yaw) > max_yaw or abs(roll) > max_roll):
+        reason = 'face_pose'
+    else:
+        reason = 'ok'
+    return QualityScore(reason == 'ok', reason, size, blur, brightness, contrast, yaw, roll)
+
+
+def quality_response(score):
+    # JSON-ready reason code, message and metrics for the kiosk
+    return {
+        "reason": score.reason,
+        "message": REASON_MESSAGES[score.reason],
+        "quality": {key: value for key, value in score._asdict().items() if key not in ('ok', 'reason')},
+    }
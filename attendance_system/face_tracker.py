@@ -0,0 +1,96 @@
+import itertools
+import numpy as np
+
+
+def box_iou(boxes_a, boxes_b):
+    # (len(a), len(b)) intersection over union of [x, y, w, h] boxes
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    ax2, ay2 = a[:, 0] + a[:, 2], a[:, 1] + a[:, 3]
+    bx2, by2 = b[:, 0] + b[:, 2], b[:, 1] + b[:, 3]
+    w = np.clip(np.minimum(ax2[:, None], bx2[None]) - np.maximum(a[:, None, 0], b[None, :, 0]), 0, None)
+    h = np.clip(np.minimum(ay2[:, None], by2[None]) - np.maximum(a[:, None, 1], b[None, :, 1]), 0, None)
+    intersection = w * h
+    union = (a[:, 2] * a[:, 3])[:, None] + (b[:, 2] * b[:, 3])[None] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-6), 0.0)
+
+
+class Track:
+    def __init__(self, track_id, face, frame_index):
+        self.id = track_id
+        self.face = face
+        self.first_frame = frame_index
+        self.last_seen = frame_index
+        self.missed = 0
+        # Cached recognition result; None until the track has been recognized once
+        self.label = None
+        self.distance = None
+        self.verified_frame = None
+
+    @property
+    def box(self):
+        return self.face['box']
+
+    def set_label(self, label, distance, frame_index):
+        self.label = label
+        self.distance = distance
+        self.verified_frame = frame_index
+
+
+class FaceTracker:
+    # Associates MTCNN detections across frames by greedy IoU matching, so each face is embedded
+    # when its track starts and then only re-verified every reverify_frames frames, or sooner when
+    # the detector's confidence for it drops below min_confidence. A track survives max_missed
+    # frames without a matching detection before it is dropped.
+
+    def __init__(self, iou_threshold=0.3, max_missed=10, reverify_frames=30, min_confidence=0.95):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.reverify_frames = reverify_frames
+        self.min_confidence = min_confidence
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def update(self, faces, frame_index):
+        # Returns the tracks matched or started by this frame's detections
+        matched_tracks = set()
+        matched_faces = set()
+        if self.tracks and faces:
+            iou = box_iou([track.box for track in self.tracks], [face['box'] for face in faces])
+            # Highest overlaps first, each track and detection used at most once
+            for flat in np.argsort(iou, axis=None)[::-1]:
+                t, f = np.unravel_index(flat, iou.shape)
+                if iou[t, f] < self.iou_threshold:
+                    break
+                if t in matched_tracks or f in matched_faces:
+                    continue
+                track = self.tracks[t]
+                track.face = faces[f]
+                track.last_seen = frame_index
+                track.missed = 0
+                matched_tracks.add(t)
+                matched_faces.add(f)
+
+        current = [self.tracks[t] for t in sorted(matched_tracks)]
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.missed += 1
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+
+        for f, face in enumerate(faces):
+            if f not in matched_faces:
+                track = Track(next(self._ids), face, frame_index)
+                self.tracks.append(track)
+                current.append(track)
+        return current
+
+    def needs_recognition(self, track, frame_index):
+        if track.verified_frame is None:
+            return True
+        if frame_index - track.verified_frame >= self.reverify_frames:
+            return True
+        return track.face.get('confidence', 1.0) < self.min_confidence
+
+    def visible_tracks(self):
+        # Tracks seen recently enough to draw; boxes stay where the face was last detected
+        return [track for track in self.tracks if track.missed == 0 or track.label is not None]
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+
+def dhash(frame, hash_size=16):
+    # Difference hash: sign of the horizontal gradient of a (hash_size, hash_size + 1) grayscale
+    # thumbnail, packed into a hash_size**2-bit int. JPEG re-encoding and sensor noise flip a few
+    # bits at most; a different person in front of the kiosk flips far more. The bilinear step to
+    # 8x the thumbnail first is there because INTER_AREA straight from a full frame costs
+    # milliseconds, while averaging the small intermediate keeps the hash stable under noise.
+    small = cv2.resize(frame, ((hash_size + 1) * 8, hash_size * 8), interpolation=cv2.INTER_LINEAR)
+    thumbnail = cv2.resize(small, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    if thumbnail.ndim == 3:
+        thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+    bits = thumbnail[:, 1:] > thumbnail[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hash_distance(a, b):
+    # Differing bits of two fingerprints; int.bit_count needs Python 3.10
+    return bin(a ^ b).count('1')
+
+
+class FrameCache:
+    # Short-lived LRU of detection and embedding results keyed by frame fingerprint, so a kiosk
+    # resubmitting the same frame after a timeout skips MTCNN and FaceNet. Entries expire after
+    # ttl seconds and at most max_entries are kept. A lookup first tries the exact fingerprint,
+    # then any live entry of the same shape within max_distance differing bits.
+
+    def __init__(self, max_entries=64, ttl=3.0, hash_size=16, max_distance=8):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hash_size = hash_size
+        self.max_distance = max_distance
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def fingerprint(self, frame, *context):
+        # context (e.g. detection settings) must match as well as the image
+        return (frame.shape, context), dhash(frame, self.hash_size)
+
+    def _expire(self, now):
+        # Hits move entries to the back, so the order is by last use rather than by age; at
+        # max_entries a full scan costs no more than the near-duplicate lookup already does
+        expired = [key for key, (stored_at, _) in self._entries.items() if now - stored_at >= self.ttl]
+        for key in expired:
+            del self._entries[key]
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is None and self.max_distance > 0:
+                context, bits = key
+                for other_key, other in self._entries.items():
+                    other_context, other_bits = other_key
+                    if other_context == context and hash_distance(bits, other_bits) <= self.max_distance:
+                        key, entry = other_key, other
+                        break
+                if entry is not None:
+                    self.near_hits += 1
+            if entry is None:
+                self.misses += 1
+                return None
+            # Refresh recency only; the entry still expires ttl seconds after it was stored
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        # The least recently used entry is evicted once max_entries is exceeded
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic(), value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import deque
+
+
+class DropOldestQueue:
+    # Bounded hand-off between pipeline stages. A full queue drops its oldest item instead of
+    # blocking the producer, so a slow consumer always gets the freshest frames.
+
+    def __init__(self, maxsize=2):
+        self._items = deque(maxlen=maxsize)
+        self._condition = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._condition:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        # Oldest queued item, or None on timeout or once the queue is closed and empty
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._items or self._closed, timeout):
+                return None
+            return self._items.popleft() if self._items else None
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class LatestValue:
+    # Single slot that readers poll or wait on; each set() bumps a version number
+
+    def __init__(self, value=None):
+        self._value = value
+        self._version = 0
+        self._condition = threading.Condition()
+
+    def set(self, value):
+        with self._condition:
+            self._value = value
+            self._version += 1
+            self._condition.notify_all()
+
+    def get(self):
+        with self._condition:
+            return self._version, self._value
+
+    def wait_newer(self, version, timeout=None):
+        with self._condition:
+            self._condition.wait_for(lambda: self._version != version, timeout)
+            return self._version, self._value
+
+
+class StageStats:
+    # Items per second and latency since the frame was captured, over the current report window
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._reset(time.perf_counter())
+
+    def _reset(self, now):
+        self._window_start = now
+        self._count = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def record(self, latency):
+        with self._lock:
+            self._count += 1
+            self._latency_total += latency
+            self._latency_max = max(self._latency_max, latency)
+
+    def report(self, dropped=None):
+        now = time.perf_counter()
+        with self._lock:
+            elapsed = max(now - self._window_start, 1e-9)
+            mean_ms = self._latency_total / self._count * 1000 if self._count else 0.0
+            line = (f"{self.name:>9}: {self._count / elapsed:6.1f} fps  latency mean {mean_ms:7.1f}ms "
+                    f"max {self._latency_max * 1000:7.1f}ms")
+            self._reset(now)
+        if dropped is not None:
+            line += f"  dropped {dropped}"
+        return line
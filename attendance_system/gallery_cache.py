@@ -0,0 +1,203 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class GalleryCache:
+    # Process-level GalleryMatcher that is loaded once and then kept in sync through a change log.
+    #
+    # Every worker polls the change log with one indexed "id > last seen" query and reloads only
+    # the students listed there, so the per-request database cost stays constant while
+    # registrations, approvals and rejections made by any worker become visible to all of them.
+    #
+    # Change ids are handed out before their transaction commits, so a lower id can become visible
+    # after a higher one was applied. Ids skipped that way are kept as gaps and asked for by the
+    # same query until they show up or gap_timeout seconds pass (a rolled-back transaction never
+    # commits its id). Only the full load looks back over the last change_window ids, once.
+    #
+    #   load_all()                  -> iterable of (student_id, templates)
+    #   load_students(ids)          -> dict of student_id -> templates (missing ids were removed)
+    #   latest_change_id()          -> newest change log id, or 0
+    #   changes_since(id, gaps=())  -> list of (change_id, student_id) newer than id or in gaps
+    #   index_factory(dim)   -> optional approximate index to attach to the matcher
+    #
+    # match/match_batch take an optional set of candidate student ids (see timetable_scope.py).
+    # Those students are searched first, in an exhaustive sub-gallery cached per candidate set
+    # until the gallery changes, and only queries that miss there fall back to the full gallery.
+
+    def __init__(self, load_all, load_students, latest_change_id, changes_since, poll_interval=0.0,
+                 index_factory=None, scoped_cache_size=8, change_window=1000, gap_timeout=60.0):
+        self._load_all = load_all
+        self._load_students = load_students
+        self._latest_change_id = latest_change_id
+        self._changes_since = changes_since
+        self.poll_interval = poll_interval
+        self.index_factory = index_factory
+        self.change_window = change_window
+        self.gap_timeout = gap_timeout
+
+        # Replaced, never mutated, by refresh; a match keeps using the snapshot it started with
+        self.gallery = None
+        self.last_change_id = 0
+        # Skipped change id -> monotonic time it was first missed
+        self._gaps = {}
+        self._last_poll = 0.0
+        self._lock = threading.Lock()
+        self.full_loads = 0
+        self.incremental_updates = 0
+        self.scoped_cache_size = scoped_cache_size
+        self._scoped = OrderedDict()
+        self._scoped_lock = threading.Lock()
+        self.scoped_matches = 0
+        self.scoped_fallbacks = 0
+
+    def invalidate(self):
+        with self._lock:
+            self.gallery = None
+        with self._scoped_lock:
+            self._scoped.clear()
+
+    def refresh(self):
+        # Returns the gallery snapshot to match against. Only the first load blocks; while one
+        # thread applies changes the others keep matching on the current snapshot.
+        gallery = self.gallery
+        if gallery is not None:
+            if time.monotonic() - self._last_poll < self.poll_interval:
+                return gallery
+            if not self._lock.acquire(blocking=False):
+                return gallery
+        else:
+            self._lock.acquire()
+        try:
+            if self.gallery is None:
+                self._full_load()
+            else:
+                self._apply_changes()
+            return self.gallery
+        finally:
+            self._lock.release()
+
+    def _apply_changes(self):
+        now = time.monotonic()
+        if now - self._last_poll < self.poll_interval:
+            return
+        self._last_poll = now
+
+        self._gaps = {change_id: missed for change_id, missed in self._gaps.items()
+                      if now - missed < self.gap_timeout}
+        changes = self._changes_since(self.last_change_id, sorted(self._gaps))
+        if not changes:
+            return
+        student_ids = {student_id for _, student_id in changes}
+        templates = self._load_students(student_ids)
+        updates = {}
+        for student_id in student_ids:
+            # Binary rows decode to arrays, so test the length rather than truthiness
+            student_templates = templates.get(student_id)
+            if student_templates is not None and len(student_templates):
+                updates[student_id] = student_templates
+        # One rebuild for the whole batch, published with a single assignment
+        gallery = self.gallery.with_changes(updates, student_ids - updates.keys())
+        self._attach_index(gallery)
+        self.gallery = gallery
+        self._track_gaps(changes, now)
+        self.incremental_updates += 1
+        logger.info(f"Gallery cache applied {len(changes)} changes for {len(student_ids)} students")
+
+    def _track_gaps(self, changes, now):
+        # Ids between the last seen one and the newest that did not come back are still in flight
+        visible = {change_id for change_id, _ in changes}
+        newest = max(visible)
+        for change_id in visible:
+            self._gaps.pop(change_id, None)
+        for change_id in range(max(self.last_change_id + 1, newest - self.change_window), newest):
+            if change_id not in visible:
+                self._gaps.setdefault(change_id, now)
+        self.last_change_id = max(self.last_change_id, newest)
+
+    def _full_load(self):
+        # numpy comes in with the matcher, on first use rather than when the app module is imported
+        from gallery_matcher import GalleryMatcher
+
+        start = time.perf_counter()
+        # Read the change log position first so changes racing with the load are replayed afterwards
+        last_change_id = self._latest_change_id() or 0
+        # Ids below it that are not visible yet belong to transactions still in flight
+        visible = {change_id for change_id, _ in self._changes_since(max(0, last_change_id - self.change_window))}
+        now = time.monotonic()
+        self._gaps = {change_id: now
+                      for change_id in range(max(1, last_change_id - self.change_window + 1), last_change_id)
+                      if change_id not in visible}
+        gallery = GalleryMatcher.from_templates(
+            self._load_all(),
+            index_candidates=Config.GALLERY_INDEX_CANDIDATES,
+            centroid_candidates=Config.GALLERY_CENTROID_CANDIDATES,
+            centroid_fallback=Config.GALLERY_CENTROID_FALLBACK
+        )
+        self._attach_index(gallery)
+        self.last_change_id = last_change_id
+        self.gallery = gallery
+        self._last_poll = time.monotonic()
+        self.full_loads += 1
+        logger.info(f"Gallery cache loaded {len(gallery)} students "
+                    f"({gallery.template_count} templates) in {time.perf_counter() - start:.3f}s")
+
+    def _attach_index(self, gallery):
+        # Deferred until the first template arrives, since the index needs the embedding dimension
+        if self.index_factory is not None and gallery.index is None and gallery.dim:
+            gallery.set_index(self.index_factory(gallery.dim))
+
+    def _scoped_gallery(self, gallery, candidates):
+        # Sub-galleries are kept per candidate set and rebuilt once the gallery they came from is replaced
+        key = frozenset(candidates)
+        with self._scoped_lock:
+            entry = self._scoped.get(key)
+            if entry is not None and entry[0] is gallery:
+                self._scoped.move_to_end(key)
+                return entry[1]
+        scoped = gallery.subset(key)
+        with self._scoped_lock:
+            self._scoped[key] = (gallery, scoped)
+            self._scoped.move_to_end(key)
+            while len(self._scoped) > self.scoped_cache_size:
+                self._scoped.popitem(last=False)
+        return scoped
+
+    def match(self, embedding, candidates=None, **kwargs):
+        return self.match_batch(embedding, candidates=candidates, **kwargs)[0]
+
+    def match_batch(self, embeddings, candidates=None, **kwargs):
+        gallery = self.refresh()
+        if not candidates:
+            return gallery.match_batch(embeddings, **kwargs)
+
+        import numpy as np
+
+        embeddings = np.atleast_2d(embeddings)
+        results = self._scoped_gallery(gallery, candidates).match_batch(embeddings, **kwargs)
+        missed = [i for i, (student_id, _) in enumerate(results) if student_id is None]
+        if missed:
+            for i, result in zip(missed, gallery.match_batch(embeddings[missed], **kwargs)):
+                results[i] = result
+        with self._scoped_lock:
+            self.scoped_matches += len(results) - len(missed)
+            self.scoped_fallbacks += len(missed)
+        return results
+
+    def stats(self):
+        gallery = self.gallery
+        with self._scoped_lock:
+            return {
+                "students": len(gallery) if gallery is not None else 0,
+                "templates": gallery.template_count if gallery is not None else 0,
+                "last_change_id": self.last_change_id,
+                "full_loads": self.full_loads,
+                "incremental_updates": self.incremental_updates,
+                "scoped_galleries": len(self._scoped),
+                "scoped_matches": self.scoped_matches,
+                "scoped_fallbacks": self.scoped_fallbacks,
+            }
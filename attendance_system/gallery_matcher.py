@@ -0,0 +1,308 @@
+import threading
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_embeddings(embeddings):
+    # L2-normalize rows into a contiguous float32 matrix so cosine similarity is a plain dot product
+    embeddings = np.ascontiguousarray(np.atleast_2d(np.asarray(embeddings, dtype=np.float32)))
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+def cosine_distances(query, templates):
+    # Cosine distance between one probe and every template, same values as scipy's cosine()
+    query = normalize_embeddings(query)[0]
+    templates = normalize_embeddings(templates)
+    if templates.shape[1] != query.shape[0]:
+        raise ValueError(f"Face embedding shapes do not match: {query.shape} vs {templates.shape[1:]}")
+    return 1.0 - templates @ query
+
+
+# All enrolled templates live in one normalized float32 matrix, stored contiguously per
+# owner, so matching is one matrix product plus np.maximum.reduceat per owner.
+#
+# An optional approximate index (see ann_index.py) can be attached for very large galleries.
+# It is keyed by template_ids, which stay stable while rows are added and removed, and only
+# the candidates it returns are reduced per owner.
+#
+# Without an index, centroid_candidates > 0 turns on a two-stage search: every owner's
+# normalized mean template is scored in one product, and only the templates of the closest
+# centroid_candidates owners are rescored exactly. With centroid_fallback, a query whose best
+# rescored match misses the threshold is searched exhaustively before it is rejected, so the
+# prefilter never turns an accept into a reject; it can only pick a different shortlisted owner.
+class GalleryMatcher:
+    def __init__(self, dim=None, index=None, index_candidates=64, centroid_candidates=0, centroid_fallback=True):
+        self.dim = dim
+        self.owners = []
+        self.templates = np.empty((0, dim or 0), dtype=np.float32)
+        self.owner_index = np.empty(0, dtype=np.int64)
+        self.template_ids = np.empty(0, dtype=np.int64)
+        self.index = index
+        self.index_candidates = index_candidates
+        self._next_template_id = 0
+        self.centroid_candidates = centroid_candidates
+        self.centroid_fallback = centroid_fallback
+        self.centroids = np.empty((0, dim or 0), dtype=np.float32)
+        self._starts = np.empty(0, dtype=np.int64)
+        self._ends = np.empty(0, dtype=np.int64)
+        self._positions = {}
+        # Shared by every matcher derived through with_changes, since they share the index
+        self._index_lock = threading.Lock()
+
+    @classmethod
+    def from_templates(cls, owner_templates, index=None, index_candidates=64, centroid_candidates=0,
+                       centroid_fallback=True):
+        # owner_templates: iterable of (owner, list of embeddings)
+        owners, blocks = [], []
+        for owner, templates in owner_templates:
+            try:
+                block = normalize_embeddings(templates)
+            except Exception as e:
+                logger.error(f"Skipping templates for {owner}: {str(e)}")
+                continue
+            if block.size == 0:
+                continue
+            owners.append(owner)
+            blocks.append(block)
+
+        matcher = cls(dim=blocks[0].shape[1] if blocks else None, index_candidates=index_candidates,
+                      centroid_candidates=centroid_candidates, centroid_fallback=centroid_fallback)
+        if blocks:
+            try:
+                matcher.templates = np.ascontiguousarray(np.concatenate(blocks))
+            except ValueError as e:
+                raise ValueError(f"Enrolled templates have inconsistent dimensions: {str(e)}")
+            matcher.owners = owners
+            matcher.owner_index = np.repeat(np.arange(len(owners)), [len(block) for block in blocks])
+            matcher.template_ids = np.arange(matcher.template_count, dtype=np.int64)
+            matcher._next_template_id = matcher.template_count
+            matcher._update_starts()
+        if index is not None:
+            matcher.set_index(index)
+        return matcher
+
+    def __len__(self):
+        return len(self.owners)
+
+    def __contains__(self, owner):
+        return owner in self._positions
+
+    @property
+    def template_count(self):
+        return self.templates.shape[0]
+
+    def set_index(self, index):
+        self.index = index
+        if index is not None and self.template_count:
+            with self._index_lock:
+                index.add(self.template_ids, self.templates)
+
+    def _update_starts(self):
+        self._positions = {owner: i for i, owner in enumerate(self.owners)}
+        if len(self.owner_index) == 0:
+            self._starts = np.empty(0, dtype=np.int64)
+            self._ends = np.empty(0, dtype=np.int64)
+            self.centroids = np.empty((0, self.templates.shape[1]), dtype=np.float32)
+            return
+        boundaries = np.flatnonzero(self.owner_index[1:] != self.owner_index[:-1]) + 1
+        self._starts = np.concatenate(([0], boundaries))
+        self._ends = np.append(self._starts[1:], len(self.owner_index))
+        self.centroids = normalize_embeddings(np.add.reduceat(self.templates, self._starts, axis=0))
+
+    def add(self, owner, templates):
+        # Replace any templates already held for this owner
+        if owner in self:
+            self.remove(owner)
+        block = normalize_embeddings(templates)
+        if block.size == 0:
+            return
+        if self.template_count and block.shape[1] != self.templates.shape[1]:
+            raise ValueError(f"Template dimension {block.shape[1]} does not match gallery dimension {self.templates.shape[1]}")
+
+        self.dim = block.shape[1]
+        template_ids = np.arange(self._next_template_id, self._next_template_id + len(block), dtype=np.int64)
+        self._next_template_id += len(block)
+        self.templates = np.ascontiguousarray(np.concatenate((self.templates.reshape(-1, self.dim), block)))
+        self.owner_index = np.concatenate((self.owner_index, np.full(len(block), len(self.owners), dtype=np.int64)))
+        self.template_ids = np.concatenate((self.template_ids, template_ids))
+        self.owners.append(owner)
+        self._update_starts()
+        if self.index is not None:
+            with self._index_lock:
+                self.index.add(template_ids, block)
+
+    def with_changes(self, updates, removals=()):
+        # New matcher with the owners in removals dropped and the owners in updates (owner ->
+        # templates) replaced or added, built with one concatenation and one centroid pass however
+        # many owners changed. self is left untouched, so readers holding it can keep matching;
+        # an attached index is shared and updated in place under the index lock.
+        dropped = set(removals) | set(updates)
+        keep = [position for position, owner in enumerate(self.owners) if owner not in dropped]
+        rows, _, lengths = self._owner_rows(keep)
+        removed_ids = np.setdiff1d(self.template_ids, self.template_ids[rows], assume_unique=True)
+
+        dim = self.templates.shape[1] if self.template_count else None
+        new_owners, blocks = [], []
+        for owner, templates in updates.items():
+            block = normalize_embeddings(templates)
+            if block.size == 0:
+                continue
+            dim = dim or block.shape[1]
+            if block.shape[1] != dim:
+                raise ValueError(f"Template dimension {block.shape[1]} does not match gallery dimension {dim}")
+            new_owners.append(owner)
+            blocks.append(block)
+        new_count = sum(len(block) for block in blocks)
+        new_ids = np.arange(self._next_template_id, self._next_template_id + new_count, dtype=np.int64)
+
+        matcher = GalleryMatcher(dim=dim or self.dim, index=self.index,
+                                 index_candidates=self.index_candidates,
+                                 centroid_candidates=self.centroid_candidates,
+                                 centroid_fallback=self.centroid_fallback)
+        matcher._index_lock = self._index_lock
+        kept = self.templates[rows]
+        matcher.templates = np.ascontiguousarray(np.concatenate([kept.reshape(-1, dim)] + blocks) if dim else kept)
+        matcher.owners = [self.owners[position] for position in keep] + new_owners
+        matcher.owner_index = np.concatenate([
+            np.repeat(np.arange(len(keep)), lengths),
+            np.repeat(np.arange(len(keep), len(keep) + len(blocks)), [len(block) for block in blocks]),
+        ]).astype(np.int64)
+        matcher.template_ids = np.concatenate((self.template_ids[rows], new_ids))
+        matcher._next_template_id = self._next_template_id + new_count
+        matcher._update_starts()
+        if self.index is not None:
+            with self._index_lock:
+                if len(removed_ids):
+                    self.index.remove(removed_ids)
+                if blocks:
+                    self.index.add(new_ids, np.concatenate(blocks))
+        return matcher
+
+    def remove(self, owner):
+        position = self._positions.get(owner)
+        if position is None:
+            return False
+        keep = self.owner_index != position
+        if self.index is not None:
+            with self._index_lock:
+                self.index.remove(self.template_ids[~keep])
+        self.templates = np.ascontiguousarray(self.templates[keep])
+        self.template_ids = self.template_ids[keep]
+        owner_index = self.owner_index[keep]
+        self.owner_index = owner_index - (owner_index > position)
+        del self.owners[position]
+        self._update_starts()
+        return True
+
+    def owner_distances(self, embeddings):
+        # (n_queries, n_owners) cosine distance to each owner's closest template
+        queries = normalize_embeddings(embeddings)
+        if queries.shape[1] != self.templates.shape[1]:
+            raise ValueError(f"Face embedding shapes do not match: {queries.shape[1:]} vs {self.templates.shape[1:]}")
+        similarities = queries @ self.templates.T
+        return 1.0 - np.maximum.reduceat(similarities, self._starts, axis=1)
+
+    def top_k_batch(self, embeddings, k=1):
+        # Per query, the k closest owners as a list of (owner, distance) in ascending distance
+        if not self.owners:
+            return [[] for _ in range(len(np.atleast_2d(embeddings)))]
+        if self.index is not None:
+            return self._index_top_k_batch(embeddings, k)
+        if 0 < self.centroid_candidates < len(self.owners):
+            return self._centroid_top_k_batch(embeddings, k)
+        distances = self.owner_distances(embeddings)
+        k = min(k, distances.shape[1])
+        candidates = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        candidate_distances = np.take_along_axis(distances, candidates, axis=1)
+        order = np.argsort(candidate_distances, axis=1)
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        candidate_distances = np.take_along_axis(candidate_distances, order, axis=1)
+        return [
+            [(self.owners[i], float(d)) for i, d in zip(row, row_distances)]
+            for row, row_distances in zip(candidates, candidate_distances)
+        ]
+
+    def _index_top_k_batch(self, embeddings, k):
+        with self._index_lock:
+            template_ids, similarities = self.index.search(embeddings, k=max(k * 4, self.index_candidates))
+        results = []
+        for row_ids, row_similarities in zip(template_ids, similarities):
+            # The shared index may already hold templates a newer matcher added; skip those
+            positions = np.minimum(np.searchsorted(self.template_ids, row_ids), len(self.template_ids) - 1)
+            found = (row_ids >= 0) & (self.template_ids[positions] == row_ids)
+            row_ids, row_similarities, positions = row_ids[found], row_similarities[found], positions[found]
+            owners = self.owner_index[positions]
+            # Candidates come back sorted by similarity, so an owner's first hit is its best template
+            _, first = np.unique(owners, return_index=True)
+            first = np.sort(first)[:k]
+            results.append([(self.owners[owners[i]], float(1.0 - row_similarities[i])) for i in first])
+        return results
+
+    def _centroid_top_k_batch(self, embeddings, k):
+        queries = normalize_embeddings(embeddings)
+        if queries.shape[1] != self.templates.shape[1]:
+            raise ValueError(f"Face embedding shapes do not match: {queries.shape[1:]} vs {self.templates.shape[1:]}")
+        # Never more than there are owners, or argpartition gets an out-of-range kth
+        candidate_count = min(max(k, self.centroid_candidates), len(self.owners))
+        shortlist = np.argpartition(queries @ self.centroids.T, -candidate_count, axis=1)[:, -candidate_count:]
+
+        results = []
+        for query, owners in zip(queries, shortlist):
+            rows, segment_starts, _ = self._owner_rows(owners)
+            distances = 1.0 - np.maximum.reduceat(self.templates[rows] @ query, segment_starts)
+            order = np.argsort(distances)[:k]
+            results.append([(self.owners[owners[i]], float(distances[i])) for i in order])
+        return results
+
+    def _owner_rows(self, positions):
+        # Template rows of the given owner positions, kept contiguous per owner for reduceat
+        positions = np.asarray(positions, dtype=np.int64)
+        lengths = self._ends[positions] - self._starts[positions]
+        segment_starts = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+        rows = np.repeat(self._starts[positions] - segment_starts, lengths) + np.arange(lengths.sum())
+        return rows, segment_starts, lengths
+
+    def subset(self, owners):
+        # Matcher over the templates of the given owners, with the same centroid prefilter but no
+        # index; owners not enrolled are skipped
+        positions = sorted(self._positions[owner] for owner in set(owners) if owner in self._positions)
+        matcher = GalleryMatcher(dim=self.dim, centroid_candidates=self.centroid_candidates,
+                                 centroid_fallback=self.centroid_fallback)
+        if positions:
+            rows, _, lengths = self._owner_rows(positions)
+            matcher.templates = np.ascontiguousarray(self.templates[rows])
+            matcher.owners = [self.owners[position] for position in positions]
+            matcher.owner_index = np.repeat(np.arange(len(positions)), lengths)
+            matcher.template_ids = self.template_ids[rows]
+            matcher._next_template_id = self._next_template_id
+            matcher._update_starts()
+        return matcher
+
+    def top_k(self, embedding, k=1):
+        return self.top_k_batch(embedding, k)[0]
+
+    def match_batch(self, embeddings, threshold=0.5):
+        # Per query, (owner, distance) of the best match, or (None, distance) when above threshold
+        results = []
+        for best in self.top_k_batch(embeddings, k=1):
+            if not best:
+                results.append((None, float('inf')))
+                continue
+            owner, distance = best[0]
+            results.append((owner if distance < threshold else None, distance))
+
+        if self.index is None and self.centroid_fallback and 0 < self.centroid_candidates < len(self.owners):
+            missed = [i for i, (owner, _) in enumerate(results) if owner is None]
+            if missed:
+                distances = self.owner_distances(np.atleast_2d(embeddings)[missed])
+                for i, row in zip(missed, distances):
+                    best = int(np.argmin(row))
+                    results[i] = (self.owners[best] if row[best] < threshold else None, float(row[best]))
+        return results
+
+    def match(self, embedding, threshold=0.5):
+        return self.match_batch(embedding, threshold)[0]
@@ -0,0 +1,85 @@
+import base64
+import struct
+import time
+import logging
+from io import BytesIO
+import cv2
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Start-of-frame markers carry the image size; C4 (DHT), C8 (JPG) and CC (DAC) share the range
+_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def decode_data_url_image(image_data):
+    # Remove the data URL prefix if present
+    if image_data.startswith('data:image'):
+        image_data = image_data.split(',')[1]
+
+    # Decode base64 image
+    image_bytes = base64.b64decode(image_data)
+
+    # Open image using PIL
+    img = Image.open(BytesIO(image_bytes))
+
+    # Convert PIL Image to numpy array for OpenCV
+    img_np = np.array(img)
+
+    # Convert RGB to BGR (OpenCV uses BGR)
+    return cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
+
+
+def jpeg_dimensions(data):
+    # (width, height) from the JPEG frame header without decoding, or None if data is not a JPEG
+    if data[:2] != b'\xff\xd8':
+        return None
+    offset = 2
+    while offset + 9 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            offset += 1
+            continue
+        if marker in _SOF_MARKERS:
+            height, width = struct.unpack('>HH', data[offset + 5:offset + 9])
+            return width, height
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            # Standalone markers have no length field
+            offset += 2
+            continue
+        offset += 2 + struct.unpack('>H', data[offset + 2:offset + 4])[0]
+    return None
+
+
+def reduced_decode_flag(dimensions, max_side):
+    # Largest libjpeg DCT downscale (1/4, 1/2) that keeps the longest side at least max_side
+    if not max_side or dimensions is None:
+        return cv2.IMREAD_COLOR, 1
+    longest = max(dimensions)
+    for factor, flag in ((4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)):
+        if longest // factor >= max_side:
+            return flag, factor
+    return cv2.IMREAD_COLOR, 1
+
+
+def decode_image_bytes(data, max_side=0):
+    # Decodes raw JPEG/PNG bytes straight into a BGR frame. For JPEGs whose longest side is at
+    # least 2x max_side, libjpeg decodes at 1/2 or 1/4 scale, which skips most of the IDCT work
+    # and never materialises the full frame. Returns (frame or None, info dict).
+    start = time.perf_counter()
+    dimensions = jpeg_dimensions(data)
+    flag, factor = reduced_decode_flag(dimensions, max_side)
+    frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag)
+    info = {
+        "payload_bytes": len(data),
+        "source_size": dimensions,
+        "reduction": factor,
+        "decode_ms": (time.perf_counter() - start) * 1000,
+    }
+    if frame is None:
+        logger.error(f"Could not decode {len(data)} byte image payload")
+    return frame, info
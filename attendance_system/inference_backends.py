@@ -0,0 +1,79 @@
+import logging
+import numpy as np
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Every backend takes a float32 batch of preprocessed (N, 160, 160, 3) faces and returns (N, dim)
+# embeddings. Heavy runtimes are imported inside the constructors so only the selected one loads.
+
+
+class TFSessionBackend:
+    name = 'tf'
+
+    def __init__(self, model_path, intra_op_threads=0, inter_op_threads=0):
+        import tensorflow as tf
+
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            with tf.io.gfile.GFile(model_path, "rb") as f:
+                graph_def = tf.compat.v1.GraphDef()
+                graph_def.ParseFromString(f.read())
+            tf.import_graph_def(graph_def, name='')
+
+        config = tf.compat.v1.ConfigProto(
+            intra_op_parallelism_threads=intra_op_threads,
+            inter_op_parallelism_threads=inter_op_threads
+        )
+        self.sess = tf.compat.v1.Session(graph=self.graph, config=config)
+
+        self.images_placeholder = self.graph.get_tensor_by_name("input:0")
+        self.embeddings = self.graph.get_tensor_by_name("embeddings:0")
+        self.phase_train_placeholder = self.graph.get_tensor_by_name("phase_train:0")
+        self.dim = int(self.embeddings.shape[-1])
+
+    def embed(self, batch):
+        feed_dict = {
+            self.images_placeholder: batch,
+            self.phase_train_placeholder: False
+        }
+        return self.sess.run(self.embeddings, feed_dict=feed_dict)
+
+
+class OnnxRuntimeBackend:
+    # FaceNet converted with convert_facenet_onnx.py, run on the ONNX Runtime CPU provider
+    name = 'onnx'
+
+    def __init__(self, model_path, intra_op_threads=0, inter_op_threads=0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        output = self.session.get_outputs()[0]
+        self.output_name = output.name
+        self.dim = int(output.shape[-1])
+
+    def embed(self, batch):
+        return self.session.run([self.output_name], {self.input_name: np.ascontiguousarray(batch, dtype=np.float32)})[0]
+
+
+def create_backend(kind=None):
+    kind = kind or Config.INFERENCE_BACKEND
+    # Thread counts apply to every runtime; 0 keeps each runtime's own default
+    threads = dict(intra_op_threads=Config.TF_INTRA_OP_THREADS, inter_op_threads=Config.TF_INTER_OP_THREADS)
+    if kind == 'tf':
+        backend = TFSessionBackend(Config.FACENET_MODEL_PATH, **threads)
+    elif kind == 'onnx':
+        backend = OnnxRuntimeBackend(Config.ONNX_MODEL_PATH, **threads)
+    elif kind == 'onnx-int8':
+        backend = OnnxRuntimeBackend(Config.ONNX_INT8_MODEL_PATH, **threads)
+        backend.name = 'onnx-int8'
+    else:
+        raise ValueError(f"Unknown inference backend: {kind}")
+    logger.info(f"Loaded {backend.name} inference backend ({backend.dim}-d embeddings, "
+                f"intra_op={threads['intra_op_threads']}, inter_op={threads['inter_op_threads']})")
+    return backend
@@ -0,0 +1,176 @@
+import threading
+import logging
+from collections import namedtuple
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Client
+import numpy as np
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Images and face crops travel through shared memory; only this small descriptor goes over the
+# socket. A list of same-shaped arrays is stacked into one segment and sent with as_list=True.
+SharedArray = namedtuple('SharedArray', ['name', 'shape', 'dtype', 'as_list'])
+
+
+def attach_shared_array(ref):
+    # Copies the payload out so the caller's segment can be released as soon as we reply
+    shm = shared_memory.SharedMemory(name=ref.name)
+    # Attaching registers the segment with this process's resource tracker, which would unlink it
+    # at exit; the client owns the segment, so hand it back.
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    try:
+        array = np.ndarray(ref.shape, dtype=ref.dtype, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+    return list(array) if ref.as_list else array
+
+
+def inference_authkey():
+    # Connections are authenticated before anything is unpickled, so the server never runs
+    # without a shared secret
+    if not Config.INFERENCE_AUTHKEY:
+        raise RuntimeError("INFERENCE_AUTHKEY must be set to use the inference server")
+    return Config.INFERENCE_AUTHKEY.encode()
+
+
+def unpack_arguments(value):
+    if isinstance(value, SharedArray):
+        return attach_shared_array(value)
+    if isinstance(value, (list, tuple)):
+        return type(value)(unpack_arguments(item) for item in value)
+    if isinstance(value, dict):
+        return {key: unpack_arguments(item) for key, item in value.items()}
+    return value
+
+
+class InferenceClient:
+    # Stand-in for FaceRecognition in web workers: every call runs in inference_server.py, which
+    # owns the only MTCNN and FaceNet copy. Each thread keeps its own socket connection, so
+    # concurrent requests in one worker do not queue behind each other.
+
+    def __init__(self, socket_path=None):
+        self.socket_path = socket_path or Config.INFERENCE_SOCKET_PATH
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = Client(self.socket_path, family='AF_UNIX', authkey=inference_authkey())
+            self._local.connection = connection
+        return connection
+
+    def _share(self, value, segments):
+        if isinstance(value, np.ndarray) and value.ndim >= 2:
+            array, as_list = np.ascontiguousarray(value), False
+        elif (isinstance(value, list) and value and all(isinstance(item, np.ndarray) for item in value)
+              and len({(item.shape, item.dtype) for item in value}) == 1):
+            array, as_list = np.stack(value), True
+        elif isinstance(value, (list, tuple)):
+            return type(value)(self._share(item, segments) for item in value)
+        else:
+            return value
+
+        shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        segments.append(shm)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+        return SharedArray(shm.name, array.shape, array.dtype.str, as_list)
+
+    def _call(self, method, *args, **kwargs):
+        segments = []
+        try:
+            args = self._share(list(args), segments)
+            kwargs = {key: self._share(value, segments) for key, value in kwargs.items()}
+            connection = self._connection()
+            try:
+                connection.send((method, args, kwargs))
+                status, result = connection.recv()
+            except (EOFError, OSError):
+                # Server restarted; drop the dead connection so the next call reconnects
+                self._local.connection = None
+                raise
+        finally:
+            for shm in segments:
+                shm.close()
+                shm.unlink()
+        if status != 'ok':
+            raise RuntimeError(f"Inference server error in {method}: {result}")
+        return result
+
+    # Same public interface as FaceRecognition
+
+    @property
+    def ready(self):
+        ready = threading.Event()
+        if self._call('status')['ready']:
+            ready.set()
+        return ready
+
+    @property
+    def warmup_timings(self):
+        return self._call('status')['warmup_timings']
+
+    @property
+    def backend(self):
+        return self._call('status')['backend']
+
+    @property
+    def last_detection_timings(self):
+        return self._call('status')['last_detection_timings']
+
+    def warmup(self, frames=None):
+        return self._call('warmup', frames=frames)
+
+    def detect_faces(self, frame, max_side=None):
+        return self._call('detect_faces', frame, max_side=max_side)
+
+    def detect_faces_timed(self, frame, max_side=None):
+        return self._call('detect_faces_timed', frame, max_side=max_side)
+
+    def align_face(self, image, face, mode=None):
+        return self._call('align_face', image, face, mode=mode)
+
+    def preprocess_face(self, face_image):
+        return face_image.astype(np.float32) / 255.0
+
+    def get_face_embedding(self, face_image):
+        return self._call('get_face_embedding', face_image)
+
+    def get_face_embeddings_batch(self, faces, batch_size=None):
+        return self._call('get_face_embeddings_batch', list(faces), batch_size=batch_size)
+
+    def embedding_batcher_stats(self):
+        return self._call('embedding_batcher_stats')
+
+    def compare_faces(self, face_embedding1, face_embedding2):
+        return self._call('compare_faces', face_embedding1, face_embedding2)
+
+    def is_valid_face(self, face_image):
+        return self._call('is_valid_face', face_image)
+
+    def get_multiple_embeddings(self, face_image, num_augmentations=5, seed=None):
+        return self._call('get_multiple_embeddings', face_image, num_augmentations=num_augmentations, seed=seed)
+
+    def check_face_quality(self, face_image, min_size=100, blur_threshold=100):
+        return self._call('check_face_quality', face_image, min_size=min_size, blur_threshold=blur_threshold)
+
+    def recognize_face(self, input_embedding, stored_embeddings, threshold=0.5):
+        return self._call('recognize_face', input_embedding, stored_embeddings, threshold=threshold)
+
+    def register_face(self, face_image):
+        return self._call('register_face', face_image)
+
+    def calculate_average_embedding(self, embeddings):
+        return self._call('calculate_average_embedding', embeddings)
+
+    def verify_face(self, face_image, stored_embeddings):
+        return self._call('verify_face', face_image, stored_embeddings)
+
+
+def load_face_recognition():
+    # FaceRecognition in this process, or a client of the shared inference server
+    if Config.USE_INFERENCE_SERVER:
+        logger.info(f"Using inference server at {Config.INFERENCE_SOCKET_PATH}")
+        return InferenceClient()
+    from claude_face_recognition import FaceRecognition
+    return FaceRecognition.get_instance()
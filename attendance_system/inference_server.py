@@ -0,0 +1,118 @@
+# Owns the single MTCNN + FaceNet copy for every web worker on this host.
+#
+#   python inference_server.py                      # listens on Config.INFERENCE_SOCKET_PATH
+#   USE_INFERENCE_SERVER=true gunicorn -w 16 api_v3:app     # both with the same INFERENCE_AUTHKEY
+#
+# Workers talk to it through inference_client.InferenceClient, which has the FaceRecognition
+# interface. Requests are (method, args, kwargs) over a Unix socket; frames and face crops are
+# passed through shared memory segments created by the client. Every connection must present
+# Config.INFERENCE_AUTHKEY before the server unpickles anything from it.
+import argparse
+import os
+import stat
+import threading
+import logging
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener
+from config import Config
+from claude_face_recognition import FaceRecognition
+from inference_client import inference_authkey, unpack_arguments
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# FaceRecognition methods a client may call
+EXPOSED_METHODS = {
+    'warmup', 'detect_faces', 'detect_faces_timed', 'align_face', 'get_face_embedding',
+    'get_face_embeddings_batch', 'compare_faces', 'is_valid_face', 'get_multiple_embeddings',
+    'check_face_quality', 'recognize_face', 'register_face', 'calculate_average_embedding',
+    'verify_face', 'embedding_batcher_stats'
+}
+
+
+def status(face_recognition):
+    return {
+        "ready": face_recognition.ready.is_set(),
+        "warmup_timings": face_recognition.warmup_timings,
+        "backend": getattr(face_recognition.backend, 'name', None),
+        "last_detection_timings": face_recognition.last_detection_timings,
+    }
+
+
+def serve_connection(connection, face_recognition):
+    with connection:
+        while True:
+            try:
+                method, args, kwargs = connection.recv()
+            except EOFError:
+                return
+            try:
+                if method == 'status':
+                    result = status(face_recognition)
+                elif method in EXPOSED_METHODS:
+                    result = getattr(face_recognition, method)(*unpack_arguments(args), **unpack_arguments(kwargs))
+                else:
+                    raise ValueError(f"Unknown method: {method}")
+                connection.send(('ok', result))
+            except Exception as e:
+                logger.exception(f"Inference request {method} failed")
+                connection.send(('error', f"{type(e).__name__}: {e}"))
+
+
+def open_listener(socket_path, authkey):
+    # Workers run as the same user or group as the server. The socket lives in a directory of its
+    # own: one the server creates at 0o750, or an existing one that already is that private. A
+    # shared directory such as /tmp or /run is refused rather than chmodded, since that would
+    # break everything else in it. The socket is bound under a 0o117 umask, so it is never
+    # reachable by other users, not even between bind and chmod.
+    directory = os.path.dirname(os.path.abspath(socket_path))
+    os.makedirs(os.path.dirname(directory), exist_ok=True)
+    try:
+        os.mkdir(directory, 0o750)
+        os.chmod(directory, 0o750)
+    except FileExistsError:
+        info = os.lstat(directory)
+        if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o027:
+            raise RuntimeError(
+                f"Socket directory {directory} must be a directory of its own, owned by this user with "
+                f"mode 0o750 or stricter (found {stat.filemode(info.st_mode)}); point INFERENCE_SOCKET_PATH "
+                f"into a dedicated directory such as /tmp/attendance_inference/"
+            )
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    umask = os.umask(0o117)
+    try:
+        return Listener(socket_path, family='AF_UNIX', authkey=authkey)
+    finally:
+        os.umask(umask)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--socket', default=Config.INFERENCE_SOCKET_PATH)
+    parser.add_argument('--no-warmup', action='store_true')
+    args = parser.parse_args()
+
+    authkey = inference_authkey()
+    face_recognition = FaceRecognition.get_instance()
+    if args.no_warmup:
+        face_recognition.ready.set()
+    else:
+        face_recognition.warmup()
+
+    listener = open_listener(args.socket, authkey)
+    with listener:
+        logger.info(f"Inference server listening on {args.socket}")
+        while True:
+            try:
+                connection = listener.accept()
+            except (AuthenticationError, EOFError, ConnectionError) as e:
+                # A wrong authkey or a client that hung up during the handshake
+                logger.warning(f"Rejected inference connection: {type(e).__name__}: {e}")
+                continue
+            # One thread per worker connection; TF and MTCNN release the GIL while they compute
+            threading.Thread(target=serve_connection, args=(connection, face_recognition), daemon=True).start()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import threading
+import logging
+from face_quality import score_face, score_frame
+from face_tracker import FaceTracker, box_iou
+
+logger = logging.getLogger(__name__)
+
+
+class KioskSession:
+    # Per-connection state of a kiosk streaming frames over the socket channel.
+    #
+    # Every frame gets the cheap path only: the frame quality gate, MTCNN and the IoU tracker.
+    # A face is embedded and matched once its track has held still (box IoU >= stable_iou with the
+    # previous frame) with good quality for stable_frames consecutive frames, and then not again
+    # for the life of the track. A track that came back unknown is retried every retry_frames.
+    #
+    #   detect_faces(frame)     -> list of MTCNN face dicts
+    #   recognize(frame, face)  -> event dict, with "student_name" set when the face was matched
+
+    def __init__(self, stable_frames=5, stable_iou=0.6, retry_frames=30, max_missed=10, iou_threshold=0.3):
+        self.stable_frames = stable_frames
+        self.stable_iou = stable_iou
+        self.retry_frames = retry_frames
+        self.tracker = FaceTracker(iou_threshold=iou_threshold, max_missed=max_missed)
+        self.frame_index = 0
+        # track id -> (box on the previous frame, consecutive stable good-quality frames)
+        self._stable = {}
+        self._busy = threading.Lock()
+        self.frames = 0
+        self.dropped = 0
+        self.recognitions = 0
+
+    def process(self, frame, detect_faces, recognize):
+        # Returns (status, recognition event or None), or None when the previous frame is still
+        # being processed; the kiosk keeps streaming, so the newest frame is never far behind
+        if not self._busy.acquire(blocking=False):
+            self.dropped += 1
+            return None
+        try:
+            self.frames += 1
+            self.frame_index += 1
+            return self._process(frame, detect_faces, recognize)
+        finally:
+            self._busy.release()
+
+    def _process(self, frame, detect_faces, recognize):
+        frame_quality = score_frame(frame)
+        if not frame_quality.ok:
+            return self._status('poor_quality', reason=frame_quality.reason), None
+
+        faces = detect_faces(frame)
+        tracks = self.tracker.update(faces, self.frame_index)
+        live = {track.id for track in self.tracker.tracks}
+        self._stable = {track_id: state for track_id, state in self._stable.items() if track_id in live}
+        if not tracks:
+            return self._status('no_face'), None
+        if len(tracks) > 1:
+            return self._status('multiple_faces'), None
+
+        track = tracks[0]
+        box = [int(v) for v in track.box]
+        if track.label is not None and (track.label != "Unknown" or
+                                        self.frame_index - track.verified_frame < self.retry_frames):
+            return self._status('recognized', box=box, track=track.id, label=track.label), None
+
+        face_quality = score_face(frame, track.face)
+        previous = self._stable.get(track.id)
+        if not face_quality.ok:
+            self._stable[track.id] = (box, 0)
+            return self._status('poor_quality', box=box, track=track.id, reason=face_quality.reason), None
+        still = previous is not None and box_iou(previous[0], box)[0, 0] >= self.stable_iou
+        count = previous[1] + 1 if still else 1
+        self._stable[track.id] = (box, count)
+        if count < self.stable_frames:
+            return self._status('hold_still', box=box, track=track.id, progress=count / self.stable_frames), None
+
+        event = recognize(frame, track.face)
+        self.recognitions += 1
+        track.set_label(event.get("student_name") or "Unknown", event.get("distance"), self.frame_index)
+        self._stable[track.id] = (box, 0)
+        event["track"] = track.id
+        return self._status('recognized', box=box, track=track.id, label=track.label), event
+
+    def _status(self, state, **fields):
+        return {"state": state, "frame": self.frame_index, **fields}
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "recognitions": self.recognitions,
+            "tracks": len(self.tracker.tracks),
+        }
@@ -0,0 +1,80 @@
+# Converts Student.face_encoding (pickled lists of floats) into the binary face_embeddings column.
+#
+#   python migrate_face_embeddings.py                      # add the column if needed, convert all rows
+#   python migrate_face_embeddings.py --dtype float16 --batch-size 2000
+#   python migrate_face_embeddings.py --clear-pickle       # also NULL the legacy column once converted
+#
+# Safe to re-run: only rows without face_embeddings are read, in id order, one batch per commit.
+import argparse
+import os
+import time
+import logging
+
+# Only the models are needed, not the recognition stack
+os.environ.setdefault('LOAD_FACE_RECOGNITION', 'false')
+
+from sqlalchemy import inspect, text
+from api_v3 import app, db, Student
+from embedding_codec import encode_embeddings
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_column():
+    columns = {column['name'] for column in inspect(db.engine).get_columns(Student.__tablename__)}
+    if 'face_embeddings' in columns:
+        return
+    column_type = Student.__table__.c.face_embeddings.type.compile(dialect=db.engine.dialect)
+    with db.engine.begin() as connection:
+        connection.execute(text(f"ALTER TABLE {Student.__tablename__} ADD COLUMN face_embeddings {column_type}"))
+    logger.info(f"Added {Student.__tablename__}.face_embeddings ({column_type})")
+
+
+def migrate(batch_size, dtype, clear_pickle):
+    converted = skipped = 0
+    last_id = 0
+    start = time.perf_counter()
+    while True:
+        rows = db.session.query(Student.id, Student.face_encoding).filter(
+            Student.id > last_id,
+            Student.face_embeddings.is_(None),
+            Student.face_encoding.isnot(None)
+        ).order_by(Student.id).limit(batch_size).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        mappings = []
+        for student_id, face_encoding in rows:
+            try:
+                mapping = {'id': student_id, 'face_embeddings': encode_embeddings(face_encoding, dtype=dtype)}
+            except (TypeError, ValueError) as e:
+                logger.error(f"Skipping student {student_id}: {e}")
+                skipped += 1
+                continue
+            if clear_pickle:
+                mapping['face_encoding'] = None
+            mappings.append(mapping)
+
+        db.session.bulk_update_mappings(Student, mappings)
+        db.session.commit()
+        converted += len(mappings)
+        logger.info(f"Converted {converted} students ({skipped} skipped), up to id {last_id}")
+
+    logger.info(f"Migration finished: {converted} converted, {skipped} skipped in {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--dtype', choices=['float32', 'float16'], default=None)
+    parser.add_argument('--clear-pickle', action='store_true')
+    args = parser.parse_args()
+
+    with app.app_context():
+        ensure_column()
+        migrate(args.batch_size, args.dtype, args.clear_pickle)
+
+
+if __name__ == '__main__':
+    main()
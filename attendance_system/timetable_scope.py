@@ -0,0 +1,70 @@
+import threading
+import time
+import logging
+from datetime import timedelta
+
+logger = logging.getLogger(__name__)
+
+
+class TimetableScope:
+    # Candidate student ids for check-in: the students of every timetable slot in progress or
+    # starting within lead_minutes. A day's slots are read once per ttl seconds, and the student
+    # set of each combination of active slots is cached until then, so consecutive check-ins
+    # during a class cost no database queries.
+    #
+    #   load_day_slots(day)          -> list of (timetable_id, start_time, end_time) for a weekday name
+    #   load_slot_students(slot_ids) -> iterable of student ids enrolled in those timetable slots
+
+    def __init__(self, load_day_slots, load_slot_students, lead_minutes=30, ttl=300.0):
+        self._load_day_slots = load_day_slots
+        self._load_slot_students = load_slot_students
+        self.lead = timedelta(minutes=lead_minutes)
+        self.ttl = ttl
+
+        self._day = None
+        self._slots = []
+        self._students = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._day = None
+
+    def active_slots(self, now):
+        day = now.strftime('%A')
+        if day != self._day or time.monotonic() - self._loaded_at >= self.ttl:
+            self._slots = self._load_day_slots(day)
+            self._students = {}
+            self._day = day
+            self._loaded_at = time.monotonic()
+        window_start = (now + self.lead).time()
+        return frozenset(slot_id for slot_id, start_time, end_time in self._slots
+                         if start_time <= window_start and end_time >= now.time())
+
+    def candidates(self, now):
+        # frozenset of student ids, or None when no class is on (search the whole gallery)
+        with self._lock:
+            slots = self.active_slots(now)
+            if not slots:
+                return None
+            students = self._students.get(slots)
+            if students is None:
+                self.misses += 1
+                students = self._students[slots] = frozenset(self._load_slot_students(slots))
+                logger.info(f"Timetable scope: {len(students)} candidate students for slots {sorted(slots)}")
+            else:
+                self.hits += 1
+            return students
+
+    def stats(self):
+        with self._lock:
+            return {
+                "day": self._day,
+                "slots": len(self._slots),
+                "cached_scopes": len(self._students),
+                "hits": self.hits,
+                "misses": self.misses,
+            }